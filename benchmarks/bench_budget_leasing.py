@@ -0,0 +1,142 @@
+# benchmarks/bench_budget_leasing.py
+"""
+Multi-process /discounts/apply throughput: shared counters vs budget leasing.
+
+Every worker process applies a single hot campaign for distinct customers
+against one SQLite file, going through DiscountService exactly like the
+endpoint does. Run from the repo root:
+
+    python -m benchmarks.bench_budget_leasing --workers 4 --applies 500
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from discount_service import models, schemas
+from discount_service.database import Base
+from discount_service.budget_leasing import BudgetLeaseManager
+from discount_service.repositories import CampaignRepository, DiscountRepository
+from discount_service.services import DiscountService
+
+
+def make_session_factory(url: str):
+    engine = create_engine(
+        url, connect_args={"check_same_thread": False, "timeout": 60}
+    )
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def prepare_db(url: str, history: int) -> int:
+    engine, session_factory = make_session_factory(url)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    db = session_factory()
+    campaign = CampaignRepository(db).create(
+        models.Campaign(
+            name="Hot campaign",
+            discount_scope=models.DiscountScope.CART,
+            discount_value_type=models.DiscountValueType.FLAT,
+            discount_value=10.0,
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=1),
+            total_budget=10_000_000.0,
+            max_transactions_per_customer_per_day=1,
+            max_uses_overall=5_000_000,
+            is_active=True,
+        )
+    )
+    if history:
+        db.execute(
+            insert(models.DiscountRedemption),
+            [
+                {
+                    "campaign_id": campaign.id,
+                    "customer_id": f"hist{i}",
+                    "discount_amount": 10.0,
+                    "created_at": now - timedelta(days=1),
+                }
+                for i in range(history)
+            ],
+        )
+        db.commit()
+    campaign_id = campaign.id
+    db.close()
+    engine.dispose()
+    return campaign_id
+
+
+def run_worker(args):
+    url, campaign_id, worker_no, applies, leasing = args
+    engine, session_factory = make_session_factory(url)
+    manager = BudgetLeaseManager(session_factory) if leasing else None
+    errors = 0
+    start = time.perf_counter()
+    for i in range(applies):
+        db = session_factory()
+        service = DiscountService(
+            CampaignRepository(db), DiscountRepository(db), budget_leases=manager
+        )
+        try:
+            service.apply_discount(
+                schemas.DiscountApplyRequest(
+                    campaign_id=campaign_id,
+                    customer_id=f"w{worker_no}c{i}",
+                    cart_total=100.0,
+                    delivery_charge=0.0,
+                )
+            )
+        except Exception:
+            errors += 1
+        finally:
+            db.close()
+    elapsed = time.perf_counter() - start
+    if manager is not None:
+        manager.return_all()
+    engine.dispose()
+    return elapsed, errors
+
+
+def run(mode: str, workers: int, applies: int, history: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        campaign_id = prepare_db(url, history)
+        leasing = mode == "leasing"
+        jobs = [(url, campaign_id, n, applies, leasing) for n in range(workers)]
+        start = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(run_worker, jobs)
+        wall = time.perf_counter() - start
+    errors = sum(e for _, e in results)
+    done = workers * applies - errors
+    return {
+        "mode": mode,
+        "workers": workers,
+        "applies": done,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "applies_per_s": round(done / wall, 1) if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--applies", type=int, default=300, help="per worker")
+    parser.add_argument(
+        "--history", type=int, default=50_000,
+        help="pre-existing redemptions for the hot campaign",
+    )
+    args = parser.parse_args()
+
+    for mode in ("shared", "leasing"):
+        print(run(mode, args.workers, args.applies, args.history))
+
+
+if __name__ == "__main__":
+    main()
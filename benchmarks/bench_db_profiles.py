@@ -0,0 +1,149 @@
+# benchmarks/bench_db_profiles.py
+"""
+Read/write throughput of the existing endpoints under each database profile.
+
+Reader threads call POST /discounts/available while writer threads call
+POST /discounts/apply, all through an app built by create_app() with the
+profile's settings. SQLite profiles use a temporary file; pass
+--postgres-url to add a Postgres profile (a scratch database: its tables
+are created and dropped).
+
+    python -m benchmarks.bench_db_profiles --seconds 5 --readers 4 --writers 2
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from discount_service import models
+from discount_service.config import settings
+from discount_service.database import Base
+from discount_service.main import create_app
+
+SQLITE_PROFILES = {
+    # What database.py did before engine settings existed.
+    "sqlite-default": dict(
+        sqlite_journal_mode="",
+        sqlite_synchronous="",
+        sqlite_cache_size_kib=0,
+        sqlite_mmap_size_bytes=0,
+    ),
+    "sqlite-wal": dict(),
+}
+
+
+def seed(session_factory, campaigns: int):
+    now = datetime.utcnow()
+    db = session_factory()
+    db.execute(
+        insert(models.Campaign),
+        [
+            {
+                "name": f"Bench {i}",
+                "discount_scope": models.DiscountScope.CART
+                if i % 2
+                else models.DiscountScope.DELIVERY,
+                "discount_value_type": models.DiscountValueType.FLAT,
+                "discount_value": 5.0,
+                "start_date": now - timedelta(days=1),
+                "end_date": now + timedelta(days=1),
+                "total_budget": 1_000_000.0,
+                "max_transactions_per_customer_per_day": 1,
+                "allow_stack_with_other_discounts": False,
+                "priority": i % 10,
+                "is_active": True,
+            }
+            for i in range(campaigns)
+        ],
+    )
+    db.commit()
+    ids = [c.id for c in db.query(models.Campaign.id).all()]
+    db.close()
+    return ids
+
+
+def run_profile(name: str, cfg, args) -> dict:
+    app = create_app(cfg)
+    database = app.state.database
+    Base.metadata.drop_all(bind=database.engine)
+    Base.metadata.create_all(bind=database.engine)
+    campaign_ids = seed(database.SessionLocal, args.campaigns)
+
+    stop = threading.Event()
+    counts = {"available": [0, 0], "apply": [0, 0]}
+    lock = threading.Lock()
+
+    def worker(kind: str, worker_no: int):
+        client = TestClient(app, raise_server_exceptions=False)
+        rng = random.Random(worker_no)
+        n = 0
+        while not stop.is_set():
+            n += 1
+            body = {
+                "customer_id": f"{kind}{worker_no}-{n}",
+                "cart_total": 500.0,
+                "delivery_charge": 50.0,
+            }
+            if kind == "apply":
+                body["campaign_id"] = rng.choice(campaign_ids)
+                r = client.post("/discounts/apply", json=body)
+            else:
+                r = client.post("/discounts/available", json=body)
+            with lock:
+                counts[kind][0 if r.status_code == 200 else 1] += 1
+
+    # Runs the lifespan hook (schema check + warm-up) once for all threads.
+    with TestClient(app):
+        threads = [
+            threading.Thread(target=worker, args=("available", i))
+            for i in range(args.readers)
+        ] + [
+            threading.Thread(target=worker, args=("apply", i)) for i in range(args.writers)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+    if cfg.database_url.startswith("postgresql"):
+        Base.metadata.drop_all(bind=database.engine)
+    database.dispose()
+    return {
+        "profile": name,
+        "available_per_s": round(counts["available"][0] / args.seconds, 1),
+        "available_errors": counts["available"][1],
+        "apply_per_s": round(counts["apply"][0] / args.seconds, 1),
+        "apply_errors": counts["apply"][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--postgres-url", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, overrides in SQLITE_PROFILES.items():
+            url = f"sqlite:///{os.path.join(tmp, name + '.db')}"
+            cfg = replace(settings, database_url=url, **overrides)
+            print(run_profile(name, cfg, args))
+    if args.postgres_url:
+        cfg = replace(settings, database_url=args.postgres_url)
+        print(run_profile("postgres", cfg, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/bench_eligibility.py
+"""
+Per-campaign eligibility cost: ORM path vs compiled CampaignRule records.
+
+Loads N active campaigns (a share of them with target lists) from an
+in-memory SQLite database, then times the static part of the
+/discounts/available loop per campaign:
+
+  orm       DiscountService._static_discount on the ORM instances, the
+            service path without a rule cache
+  compile   compile_campaign() + evaluate() (cold CampaignRuleCache)
+  cached    CampaignRuleCache.active() + evaluate(), the warm service path
+  evaluate  evaluate() alone on compiled rules
+
+    python -m benchmarks.bench_eligibility --campaigns 1000 5000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from discount_service import models
+from discount_service.database import Base
+from discount_service.eligibility import CampaignRuleCache, compile_campaign, evaluate
+from discount_service.repositories import CampaignRepository, DiscountRepository
+from discount_service.services import DiscountService
+
+
+def load_campaigns(count: int, targeted_share: float, targets_per_campaign: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    db = session_factory()
+    db.execute(
+        insert(models.Campaign),
+        [
+            {
+                "name": f"Campaign {i}",
+                "discount_scope": rng.choice(list(models.DiscountScope)),
+                "discount_value_type": rng.choice(list(models.DiscountValueType)),
+                "discount_value": float(rng.randint(1, 50)),
+                "max_discount_amount": rng.choice([None, 100.0, 250.0]),
+                "start_date": now - timedelta(days=1),
+                "end_date": now + timedelta(days=1),
+                "total_budget": 100_000.0,
+                "min_cart_total": rng.choice([None, 0.0, 300.0, 1000.0]),
+                "min_delivery_charge": rng.choice([None, 20.0]),
+                "max_transactions_per_customer_per_day": 1,
+                "priority": rng.randint(0, 20),
+                "is_active": True,
+            }
+            for i in range(count)
+        ],
+    )
+    ids = [row[0] for row in db.query(models.Campaign.id).all()]
+    targets = []
+    for cid in ids:
+        if rng.random() < targeted_share:
+            targets.extend(
+                {"campaign_id": cid, "customer_id": f"cust{rng.randint(0, 5000)}"}
+                for _ in range(targets_per_campaign)
+            )
+    if targets:
+        # Duplicate (campaign, customer) pairs are dropped by the constraint.
+        db.execute(insert(models.CampaignTargetCustomer).prefix_with("OR IGNORE"), targets)
+    db.commit()
+
+    campaigns = CampaignRepository(db).get_active_for_now(datetime.utcnow())
+    return db, campaigns
+
+
+def orm_path(service, campaigns, customer_id, cart_total, delivery_charge):
+    hits = 0
+    for camp in campaigns:
+        if service._static_discount(camp, customer_id, cart_total, delivery_charge) > 0:
+            hits += 1
+    return hits
+
+
+def compiled_path(rules, customer_id, cart_total, delivery_charge):
+    hits = 0
+    for rule in rules:
+        if evaluate(rule, customer_id, cart_total, delivery_charge) > 0:
+            hits += 1
+    return hits
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--campaigns", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--targeted-share", type=float, default=0.3)
+    parser.add_argument("--targets-per-campaign", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    request = ("cust42", 800.0, 40.0)
+    for count in args.campaigns:
+        db, campaigns = load_campaigns(
+            count, args.targeted_share, args.targets_per_campaign
+        )
+        service = DiscountService(CampaignRepository(db), DiscountRepository(db))
+        rules = [compile_campaign(c) for c in campaigns]
+        assert orm_path(service, campaigns, *request) == compiled_path(rules, *request)
+        cache = CampaignRuleCache(render=DiscountService._to_campaign_out)
+        cache.sync(db)
+        now = datetime.utcnow()
+
+        timings = {
+            "orm": best_of(lambda: orm_path(service, campaigns, *request), args.repeat),
+            "compile": best_of(
+                lambda: compiled_path(map(compile_campaign, campaigns), *request),
+                args.repeat,
+            ),
+            "cached": best_of(
+                lambda: compiled_path((rule for rule, _ in cache.active(now)), *request),
+                args.repeat,
+            ),
+            "evaluate": best_of(lambda: compiled_path(rules, *request), args.repeat),
+        }
+        print(
+            {
+                "campaigns": len(campaigns),
+                **{
+                    f"{name}_ns_per_campaign": round(seconds / len(campaigns) * 1e9)
+                    for name, seconds in timings.items()
+                },
+            }
+        )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
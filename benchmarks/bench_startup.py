@@ -0,0 +1,117 @@
+# benchmarks/bench_startup.py
+"""
+Startup time and first-request latency, with and without warm-up.
+
+Measures (1) importing discount_service.main in a fresh interpreter, which
+must not touch the database, and (2) for a database with N live campaigns,
+the lifespan startup time and the latency of the first and second
+POST /discounts/available with warm_up_on_startup on and off.
+
+    python -m benchmarks.bench_startup --campaigns 1000 10000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from discount_service import models
+from discount_service.config import settings
+from discount_service.database import Base, build_engine
+from discount_service.main import create_app
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import discount_service.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def seed(url: str, campaigns: int) -> None:
+    # Like production, most campaigns are not eligible for a given cart
+    # (here: min_cart_total above it), so the request measures loading and
+    # filtering campaigns rather than per-campaign usage queries.
+    engine = build_engine(replace(settings, database_url=url))
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.Campaign),
+            [
+                {
+                    "name": f"Startup {i}",
+                    "discount_scope": models.DiscountScope.CART,
+                    "discount_value_type": models.DiscountValueType.PERCENT,
+                    "discount_value": 10.0,
+                    "start_date": now - timedelta(days=1),
+                    "end_date": now + timedelta(days=1),
+                    "total_budget": 10_000.0,
+                    "min_cart_total": 100.0 if i % 100 == 0 else 1000.0,
+                    "max_transactions_per_customer_per_day": 1,
+                    "priority": i % 10,
+                    "is_active": True,
+                }
+                for i in range(campaigns)
+            ],
+        )
+    engine.dispose()
+
+
+def measure_import(tmp: str) -> dict:
+    db_path = os.path.join(tmp, "import.db")
+    env = dict(os.environ, DISCOUNT_DATABASE_URL=f"sqlite:///{db_path}")
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return {
+        "import_s": round(float(out.stdout.strip().splitlines()[-1]), 4),
+        "import_touched_db": os.path.exists(db_path),
+    }
+
+
+def measure_startup(url: str, warm_up: bool) -> dict:
+    app = create_app(replace(settings, database_url=url, warm_up_on_startup=warm_up))
+    body = {"customer_id": "bench", "cart_total": 500.0, "delivery_charge": 50.0}
+    start = time.perf_counter()
+    with TestClient(app) as client:
+        startup = time.perf_counter() - start
+        timings = []
+        for _ in range(2):
+            t = time.perf_counter()
+            r = client.post("/discounts/available", json=body)
+            assert r.status_code == 200, r.text
+            timings.append(time.perf_counter() - t)
+    app.state.database.dispose()
+    return {
+        "warm_up": warm_up,
+        "startup_s": round(startup, 4),
+        "first_request_ms": round(timings[0] * 1000, 2),
+        "second_request_ms": round(timings[1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--campaigns", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(measure_import(tmp))
+        for count in args.campaigns:
+            url = f"sqlite:///{os.path.join(tmp, f'startup-{count}.db')}"
+            seed(url, count)
+            for warm_up in (False, True):
+                print({"campaigns": count, **measure_startup(url, warm_up)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/fixtures.py
+"""
+Deterministic synthetic datasets for the benchmarks.
+
+Everything is bulk-inserted with Core statements in one transaction, so a
+dataset with thousands of campaigns and hundreds of thousands of
+redemptions builds in seconds.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from discount_service import models
+
+CHUNK = 10_000
+
+
+@dataclass
+class Dataset:
+    campaign_ids: List[int]
+    # Campaigns every customer may use (no target list).
+    open_campaign_ids: List[int]
+    customer_ids: List[str]
+
+
+def _chunks(rows, size=CHUNK):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def build_dataset(
+    engine: Engine,
+    campaigns: int,
+    targets_per_campaign: int = 0,
+    redemptions: int = 0,
+    customers: int = 1000,
+    targeted_share: float = 0.3,
+    seed: int = 42,
+) -> Dataset:
+    """Fill an empty schema with `campaigns` active campaigns and history."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    customer_ids = [f"cust{i}" for i in range(customers)]
+
+    campaign_rows = [
+        {
+            "name": f"Synthetic {i}",
+            "discount_scope": rng.choice(list(models.DiscountScope)),
+            "discount_value_type": rng.choice(list(models.DiscountValueType)),
+            "discount_value": float(rng.randint(1, 50)),
+            "max_discount_amount": rng.choice([None, 100.0, 250.0]),
+            "start_date": now - timedelta(days=rng.randint(1, 30)),
+            "end_date": now + timedelta(days=rng.randint(1, 30)),
+            "total_budget": float(rng.choice([10_000, 100_000, 1_000_000])),
+            "min_cart_total": rng.choice([None, 0.0, 300.0, 1000.0]),
+            "min_delivery_charge": rng.choice([None, 0.0, 20.0]),
+            "max_transactions_per_customer_per_day": rng.randint(1, 3),
+            "max_uses_overall": rng.choice([None, 100_000, 1_000_000]),
+            "allow_stack_with_other_discounts": False,
+            "priority": rng.randint(0, 20),
+            "is_active": True,
+        }
+        for i in range(campaigns)
+    ]
+
+    with engine.begin() as conn:
+        for chunk in _chunks(campaign_rows):
+            conn.execute(insert(models.Campaign), chunk)
+        campaign_ids = [
+            row[0]
+            for row in conn.execute(
+                models.Campaign.__table__.select()
+                .with_only_columns(models.Campaign.id)
+                .order_by(models.Campaign.id)
+            )
+        ]
+
+        targeted = set()
+        if targets_per_campaign and customers:
+            target_rows = []
+            for cid in campaign_ids:
+                if rng.random() >= targeted_share:
+                    continue
+                targeted.add(cid)
+                for customer_id in rng.sample(
+                    customer_ids, min(targets_per_campaign, customers)
+                ):
+                    target_rows.append({"campaign_id": cid, "customer_id": customer_id})
+            for chunk in _chunks(target_rows):
+                conn.execute(insert(models.CampaignTargetCustomer), chunk)
+
+        if redemptions and campaign_ids:
+            redemption_rows = [
+                {
+                    "campaign_id": rng.choice(campaign_ids),
+                    "customer_id": rng.choice(customer_ids),
+                    "discount_amount": round(rng.uniform(5.0, 100.0), 2),
+                    "created_at": now - timedelta(minutes=rng.randint(1, 30 * 24 * 60)),
+                    "order_id": f"order{i}",
+                }
+                for i in range(redemptions)
+            ]
+            for chunk in _chunks(redemption_rows):
+                conn.execute(insert(models.DiscountRedemption), chunk)
+
+    return Dataset(
+        campaign_ids=campaign_ids,
+        open_campaign_ids=[cid for cid in campaign_ids if cid not in targeted],
+        customer_ids=customer_ids,
+    )
@@ -0,0 +1,314 @@
+# benchmarks/load.py
+"""
+Concurrent HTTP load against a running app, with invariant checks after.
+
+Sends POST /discounts/available and POST /discounts/apply traffic, either
+replayed from a JSONL file or generated as a synthetic mix, from
+--concurrency async workers, optionally paced to --rate requests/s. Each
+replay line is one request:
+
+    {"endpoint": "/discounts/apply", "body": {"customer_id": "c1", ...}}
+
+Without --url the app is launched locally with uvicorn on a temporary
+SQLite database seeded with campaigns whose budgets, overall uses and
+daily limits run out during the test. With --url, pass --database-url too
+so the invariants can be checked. Reported per endpoint: throughput and
+p50/p95/p99 latency. Then every campaign is checked against total_budget
+and max_uses_overall, and every customer against the daily limit.
+
+    python -m benchmarks.load --duration 20 --concurrency 32 --rate 400
+    python -m benchmarks.load --replay traffic.jsonl --concurrency 16
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import replace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from discount_service import models
+from discount_service.config import settings
+from discount_service.database import Database, verify_schema
+
+from .fixtures import build_dataset
+
+AVAILABLE = "/discounts/available"
+APPLY = "/discounts/apply"
+# Budgets are floats; sums may drift by rounding.
+EPSILON = 1e-6
+
+Request = Tuple[str, dict]
+
+
+def read_replay(path: str) -> Iterator[Request]:
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                yield record["endpoint"], record["body"]
+
+
+def synthetic_traffic(
+    campaign_ids: List[int], customers: int, apply_share: float, seed: int
+) -> Iterator[Request]:
+    # A small customer pool and a few hot campaigns, so daily limits and
+    # budgets are contended.
+    rng = random.Random(seed)
+    hot = campaign_ids[: max(1, len(campaign_ids) // 10)]
+    for n in itertools.count():
+        body = {
+            "customer_id": f"cust{int(rng.paretovariate(1.2)) % customers}",
+            "cart_total": round(rng.uniform(100.0, 2000.0), 2),
+            "delivery_charge": round(rng.uniform(0.0, 80.0), 2),
+        }
+        if rng.random() < apply_share:
+            body["campaign_id"] = rng.choice(hot if rng.random() < 0.8 else campaign_ids)
+            body["order_id"] = f"load{n}"
+            yield APPLY, body
+        else:
+            yield AVAILABLE, body
+
+
+def seed_contended(database: Database, campaigns: int, customers: int, seed: int) -> List[int]:
+    verify_schema(database.engine, create_missing=True)
+    dataset = build_dataset(
+        database.engine, campaigns=campaigns, customers=customers, seed=seed
+    )
+    db = database.SessionLocal()
+    try:
+        db.execute(
+            update(models.Campaign).values(
+                total_budget=500.0,
+                max_uses_overall=30,
+                min_cart_total=None,
+                min_delivery_charge=None,
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+    return dataset.campaign_ids
+
+
+def check_invariants(db: Session) -> List[str]:
+    """Human-readable violations of the budget, overall-use and daily caps."""
+    R, C = models.DiscountRedemption, models.Campaign
+    violations = []
+    totals = (
+        db.query(
+            C.id,
+            C.total_budget,
+            C.max_uses_overall,
+            func.sum(R.discount_amount),
+            func.count(R.id),
+        )
+        .join(R, R.campaign_id == C.id)
+        .group_by(C.id, C.total_budget, C.max_uses_overall)
+        .all()
+    )
+    for cid, budget, max_uses, spent, uses in totals:
+        if spent > budget + EPSILON:
+            violations.append(f"campaign {cid}: spent {spent:.2f} > total_budget {budget:.2f}")
+        if max_uses is not None and uses > max_uses:
+            violations.append(f"campaign {cid}: {uses} uses > max_uses_overall {max_uses}")
+
+    day = func.date(R.created_at)
+    daily = (
+        db.query(R.campaign_id, R.customer_id, day, func.count(R.id))
+        .group_by(R.campaign_id, R.customer_id, day)
+        .all()
+    )
+    limits = dict(db.query(C.id, C.max_transactions_per_customer_per_day).all())
+    for cid, customer_id, when, uses in daily:
+        if cid in limits and uses > limits[cid]:
+            violations.append(
+                f"campaign {cid}: customer {customer_id} used it {uses} times on {when}"
+                f" > daily limit {limits[cid]}"
+            )
+    return violations
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, status: int, seconds: float):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def report(self, elapsed: float) -> List[dict]:
+        rows = []
+        for endpoint, timings in sorted(self.latencies.items()):
+            timings = sorted(timings)
+
+            def pct(p):
+                return round(timings[min(len(timings) - 1, int(len(timings) * p))] * 1000, 2)
+
+            rows.append(
+                {
+                    "endpoint": endpoint,
+                    "requests": len(timings),
+                    "per_s": round(len(timings) / elapsed, 1),
+                    "p50_ms": pct(0.50),
+                    "p95_ms": pct(0.95),
+                    "p99_ms": pct(0.99),
+                    "statuses": dict(self.statuses[endpoint]),
+                }
+            )
+        return rows
+
+
+async def run_load(
+    url: str,
+    traffic: Iterator[Request],
+    concurrency: int,
+    rate: Optional[float],
+    duration: float,
+) -> Tuple[Stats, float]:
+    stats = Stats()
+    start = time.perf_counter()
+    deadline = start + duration
+    next_slot = start
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_slot
+        while time.perf_counter() < deadline:
+            if rate:
+                slot, next_slot = next_slot, max(next_slot, time.perf_counter()) + 1 / rate
+                delay = slot - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            request = next(traffic, None)
+            if request is None:
+                return
+            endpoint, body = request
+            sent = time.perf_counter()
+            try:
+                r = await client.post(endpoint, json=body)
+                status = r.status_code
+            except httpx.HTTPError:
+                status = 0
+            stats.record(endpoint, status, time.perf_counter() - sent)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return stats, time.perf_counter() - start
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_app(database_url: str, workers: int, env_overrides: Dict[str, str]):
+    port = free_port()
+    env = dict(os.environ, DISCOUNT_DATABASE_URL=database_url, **env_overrides)
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "discount_service.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        if proc.poll() is not None:
+            raise RuntimeError(f"App exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/health/ready").status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("App did not become ready")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=None, help="target a running app instead")
+    parser.add_argument("--database-url", default=None, help="database of --url app")
+    parser.add_argument("--replay", default=None, help="JSONL file of requests")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=None, help="requests/s, default open")
+    parser.add_argument("--apply-share", type=float, default=0.3)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="KEY=VALUE",
+        help="extra settings for the launched app, e.g. DISCOUNT_BUDGET_LEASING=true",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        database = Database(replace(settings, database_url=database_url))
+        proc = None
+        campaign_ids: List[int] = []
+        if args.url:
+            url = args.url
+        else:
+            campaign_ids = seed_contended(database, args.campaigns, args.customers, args.seed)
+            proc, url = launch_app(
+                database_url, args.workers, dict(kv.split("=", 1) for kv in args.env)
+            )
+        if not campaign_ids and not args.replay:
+            db = database.SessionLocal()
+            campaign_ids = [row[0] for row in db.query(models.Campaign.id).all()]
+            db.close()
+
+        traffic = (
+            read_replay(args.replay)
+            if args.replay
+            else synthetic_traffic(campaign_ids, args.customers, args.apply_share, args.seed)
+        )
+        try:
+            stats, elapsed = asyncio.run(
+                run_load(url, traffic, args.concurrency, args.rate, args.duration)
+            )
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+        for row in stats.report(elapsed):
+            print(row)
+
+        violations = []
+        if args.url and not args.database_url:
+            print("No --database-url given, invariants not checked")
+        else:
+            db = database.SessionLocal()
+            try:
+                violations = check_invariants(db)
+            finally:
+                db.close()
+            print(f"Invariant violations: {len(violations)}")
+            for violation in violations:
+                print("  " + violation)
+        database.dispose()
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
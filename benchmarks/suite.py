@@ -0,0 +1,307 @@
+# benchmarks/suite.py
+"""
+Microbenchmarks for the discount engine's hot paths on synthetic data.
+
+For every combination of the dataset parameters (active campaigns, target
+customers per targeted campaign, redemption history rows, customers) a
+fresh SQLite database is built with benchmarks.fixtures and these cases
+are timed, together with the SQL statements each call issues:
+
+  available.uncached  DiscountService.get_available_campaigns, no rule cache
+  available.cached    the same with a warm CampaignRuleCache
+  apply               DiscountService.apply_discount on untargeted campaigns
+  list.first          CampaignRepository.list_paginated, first page
+  list.last           CampaignRepository.list_paginated, last page
+  strategy.percent    PercentDiscountStrategy.compute (no database)
+  strategy.flat       FlatDiscountStrategy.compute (no database)
+
+Results are written as JSON; with --baseline they are compared against an
+earlier run and regressions beyond --tolerance are reported (and fail the
+run with --fail-on-regression). Everything runs locally, nothing is fetched.
+
+    python -m benchmarks.suite --campaigns 100 1000 --redemptions 0 100000 \\
+        --output bench.json --baseline baseline.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import sqlalchemy
+from sqlalchemy import event
+
+from discount_service import schemas
+from discount_service.config import settings
+from discount_service.database import Database, verify_schema
+from discount_service.discount_strategies import (
+    FlatDiscountStrategy,
+    PercentDiscountStrategy,
+)
+from discount_service.eligibility import CampaignRuleCache
+from discount_service.repositories import CampaignRepository, DiscountRepository
+from discount_service.services import DiscountService
+
+from .fixtures import build_dataset
+
+PARAMS = ("campaigns", "targets", "redemptions", "customers")
+STRATEGY_LOOPS = 10_000
+
+
+class QueryCounter:
+    """Counts statements sent to the database through the given engines."""
+
+    def __init__(self, *engines):
+        self.count = 0
+        self.engines = {id(e): e for e in engines}.values()
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+
+
+def measure(
+    fn: Callable[[int], None], calls: int, warmup: int, counter: Optional[QueryCounter]
+) -> dict:
+    for n in range(warmup):
+        fn(-1 - n)
+    timings = []
+    errors = 0
+    queries_before = counter.count if counter else 0
+    for n in range(calls):
+        start = time.perf_counter_ns()
+        try:
+            fn(n)
+        except ValueError:
+            # Business-rule rejections still exercise the path being timed.
+            errors += 1
+        timings.append(time.perf_counter_ns() - start)
+    timings.sort()
+    return {
+        "calls": calls,
+        "mean_us": round(statistics.fmean(timings) / 1000, 2),
+        "p50_us": round(timings[len(timings) // 2] / 1000, 2),
+        "p95_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] / 1000, 2),
+        "queries_per_call": (
+            round((counter.count - queries_before) / calls, 2) if counter else 0.0
+        ),
+        "rejected": errors,
+    }
+
+
+def run_dataset(params: Dict[str, int], args, tmp: str) -> List[dict]:
+    name = "-".join(f"{k}{params[k]}" for k in PARAMS)
+    cfg = replace(settings, database_url=f"sqlite:///{os.path.join(tmp, name + '.db')}")
+    database = Database(cfg)
+    verify_schema(database.engine, create_missing=True)
+    dataset = build_dataset(
+        database.engine,
+        campaigns=params["campaigns"],
+        targets_per_campaign=params["targets"],
+        redemptions=params["redemptions"],
+        customers=params["customers"],
+        seed=args.seed,
+    )
+    rng = random.Random(args.seed)
+    cache = CampaignRuleCache(render=DiscountService._to_campaign_out)
+    page_size = 20
+    last_page = max(1, -(-params["campaigns"] // page_size))
+
+    def check_request(n: int) -> schemas.DiscountCheckRequest:
+        return schemas.DiscountCheckRequest(
+            customer_id=rng.choice(dataset.customer_ids),
+            cart_total=round(rng.uniform(100.0, 1500.0), 2),
+            delivery_charge=round(rng.uniform(0.0, 60.0), 2),
+        )
+
+    def with_service(body, rule_cache=None):
+        def call(n: int):
+            db = database.SessionLocal()
+            try:
+                body(
+                    DiscountService(
+                        CampaignRepository(db), DiscountRepository(db), rule_cache=rule_cache
+                    ),
+                    n,
+                )
+            finally:
+                db.close()
+
+        return call
+
+    def list_page(page: int):
+        def call(n: int):
+            db = database.SessionLocal()
+            try:
+                CampaignRepository(db).list_paginated(page, page_size)
+            finally:
+                db.close()
+
+        return call
+
+    def apply(service: DiscountService, n: int):
+        if not dataset.open_campaign_ids:
+            raise ValueError("No untargeted campaigns")
+        service.apply_discount(
+            schemas.DiscountApplyRequest(
+                campaign_id=rng.choice(dataset.open_campaign_ids),
+                # A fresh customer per call keeps the daily limit out of it.
+                customer_id=f"bench-apply{n}",
+                cart_total=1500.0,
+                delivery_charge=60.0,
+            )
+        )
+
+    warm = database.SessionLocal()
+    cache.sync(warm)
+    warm.close()
+
+    cases = {
+        "available.uncached": with_service(
+            lambda s, n: s.get_available_campaigns(check_request(n))
+        ),
+        "available.cached": with_service(
+            lambda s, n: s.get_available_campaigns(check_request(n)), rule_cache=cache
+        ),
+        "apply": with_service(apply),
+        "list.first": list_page(1),
+        "list.last": list_page(last_page),
+    }
+    results = []
+    with QueryCounter(database.engine, database.read_engine) as counter:
+        for case, fn in cases.items():
+            results.append(
+                {"case": case, "params": params, **measure(fn, args.calls, args.warmup, counter)}
+            )
+            print(format_row(results[-1]), flush=True)
+    database.dispose()
+    return results
+
+
+def run_strategies() -> List[dict]:
+    results = []
+    for case, strategy in (
+        ("strategy.percent", PercentDiscountStrategy()),
+        ("strategy.flat", FlatDiscountStrategy()),
+    ):
+        compute = strategy.compute
+
+        def loop(n: int, compute=compute):
+            for _ in range(STRATEGY_LOOPS):
+                compute(800.0, 10.0, 250.0, 10_000.0)
+
+        row = {"case": case, "params": {}, **measure(loop, 20, 2, None)}
+        # Report the cost of a single compute() call.
+        for key in ("mean_us", "p50_us", "p95_us"):
+            row[key] = round(row[key] / STRATEGY_LOOPS, 4)
+        results.append(row)
+        print(format_row(row), flush=True)
+    return results
+
+
+def result_key(row: dict) -> str:
+    params = ",".join(f"{k}={row['params'][k]}" for k in PARAMS if k in row["params"])
+    return f"{row['case']}[{params}]"
+
+
+def format_row(row: dict) -> str:
+    return (
+        f"{result_key(row):<70} mean {row['mean_us']:>10} us  "
+        f"p95 {row['p95_us']:>10} us  queries/call {row['queries_per_call']}"
+    )
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[dict]:
+    """Rows present in both runs, with ratios and a regression flag."""
+    previous = {result_key(row): row for row in baseline["results"]}
+    rows = []
+    for row in results:
+        key = result_key(row)
+        base = previous.get(key)
+        if base is None:
+            continue
+        ratio = row["mean_us"] / base["mean_us"] if base["mean_us"] else 1.0
+        rows.append(
+            {
+                "key": key,
+                "mean_ratio": round(ratio, 3),
+                "queries_delta": round(row["queries_per_call"] - base["queries_per_call"], 2),
+                "regression": ratio > 1 + tolerance
+                or row["queries_per_call"] > base["queries_per_call"],
+            }
+        )
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--campaigns", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--targets", type=int, nargs="+", default=[20])
+    parser.add_argument("--redemptions", type=int, nargs="+", default=[0, 50_000])
+    parser.add_argument("--customers", type=int, nargs="+", default=[1000])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=None, help="results JSON to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run_strategies()
+    with tempfile.TemporaryDirectory() as tmp:
+        for values in itertools.product(
+            args.campaigns, args.targets, args.redemptions, args.customers
+        ):
+            results.extend(run_dataset(dict(zip(PARAMS, values)), args, tmp))
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "calls": args.calls,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        for row in compare(results, baseline, args.tolerance):
+            flag = "REGRESSION" if row["regression"] else "ok"
+            print(
+                f"{row['key']:<70} x{row['mean_ratio']:<7} "
+                f"queries {row['queries_delta']:+}  {flag}"
+            )
+            if row["regression"]:
+                regressions.append(row)
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+# discount_service/admission.py
+"""
+Admission control for the checkout endpoints.
+
+Each limited endpoint admits up to `max_concurrent` requests; the next
+`max_queue` wait in FIFO order for at most `queue_timeout` and the rest are
+turned away at once with 429. A request whose wait times out gets 503.
+Either way the rejection is cheap and happens before the request takes a
+threadpool thread or a database connection, so a flash sale cannot stack
+up seconds of queued work that clients have already given up on.
+
+Clients may send a deadline: X-Request-Timeout-Ms (relative to arrival) or
+X-Request-Deadline (absolute, Unix seconds). Requests that are already past
+it, or pass it while queued, get 504 and are never run; handlers pass
+request_deadline() on so work that cannot be undone (writing a redemption)
+is skipped once it has passed, raising DeadlineExceeded.
+
+When /discounts/available is close to its limit, or /discounts/apply has
+requests queued, available requests are marked degraded and the service
+answers from static rules alone (provisional results) so that reads stop
+competing with redemptions for the database.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from starlette.requests import Request
+
+APPLY = "apply"
+AVAILABLE = "available"
+ROUTES = {
+    ("POST", "/discounts/apply"): APPLY,
+    ("POST", "/discounts/apply-by-code"): APPLY,
+    ("POST", "/discounts/available"): AVAILABLE,
+}
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO queue; event-loop only."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, deadline: Optional[float]) -> Optional[int]:
+        """None when admitted, otherwise the HTTP status to reject with."""
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return 429
+
+        timeout = self.queue_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, max(timeout, 0.0))
+            return None
+        except asyncio.TimeoutError:
+            # release() may have handed us the slot just as the wait expired.
+            if waiter.done() and not waiter.cancelled():
+                return None
+            self._discard(waiter)
+            if deadline is not None and time.monotonic() >= deadline:
+                return 504
+            return 503
+        except asyncio.CancelledError:
+            # The request went away (e.g. client disconnect). Give back a slot
+            # release() already handed us; otherwise stop counting as queued.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter still waiting.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        apply: AdmissionLimiter,
+        available: AdmissionLimiter,
+        degrade_available_at: int = 0,
+    ):
+        self.limiters = {APPLY: apply, AVAILABLE: available}
+        self.degrade_available_at = degrade_available_at
+
+    def should_degrade_available(self) -> bool:
+        available = self.limiters[AVAILABLE]
+        if self.degrade_available_at and available.in_flight >= self.degrade_available_at:
+            return True
+        return self.limiters[APPLY].waiting > 0
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"in_flight": limiter.in_flight, "waiting": limiter.waiting}
+            for name, limiter in self.limiters.items()
+        }
+
+
+def parse_deadline(headers, arrived: float) -> Optional[float]:
+    """Client deadline as a time.monotonic() value, or None."""
+    deadline = None
+    timeout_ms = headers.get(b"x-request-timeout-ms")
+    if timeout_ms is not None:
+        try:
+            deadline = arrived + float(timeout_ms) / 1000.0
+        except ValueError:
+            pass
+    absolute = headers.get(b"x-request-deadline")
+    if absolute is not None:
+        try:
+            candidate = arrived + (float(absolute) - time.time())
+        except ValueError:
+            candidate = None
+        if candidate is not None and (deadline is None or candidate < deadline):
+            deadline = candidate
+    return deadline
+
+
+class DeadlineExceeded(Exception):
+    """The client's deadline passed before irreversible work started."""
+
+
+def request_deadline(request: Request) -> Optional[float]:
+    """The request's deadline as a time.monotonic() value, or None."""
+    return request.scope.get("state", {}).get("deadline")
+
+
+def deadline_exceeded(request: Request) -> bool:
+    deadline = request_deadline(request)
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def is_degraded(request: Request) -> bool:
+    return bool(request.scope.get("state", {}).get("degraded"))
+
+
+_REJECTIONS: Dict[int, Tuple[str, Optional[str]]] = {
+    429: ("Too many requests queued, retry shortly", "1"),
+    503: ("Service overloaded, retry shortly", "1"),
+    504: ("Request deadline exceeded", None),
+}
+
+
+async def _reject(send, status: int) -> None:
+    detail, retry_after = _REJECTIONS[status]
+    body = json.dumps({"detail": detail}).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    if retry_after is not None:
+        headers.append((b"retry-after", retry_after.encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = None
+        if scope["type"] == "http":
+            name = ROUTES.get((scope["method"], scope["path"]))
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.monotonic()
+        deadline = parse_deadline(dict(scope["headers"]), arrived)
+        if deadline is not None and arrived >= deadline:
+            await _reject(send, 504)
+            return
+
+        limiter = self.controller.limiters[name]
+        rejected = await limiter.acquire(deadline)
+        if rejected is not None:
+            await _reject(send, rejected)
+            return
+        try:
+            state = scope.setdefault("state", {})
+            state["deadline"] = deadline
+            if name == AVAILABLE:
+                state["degraded"] = self.controller.should_degrade_available()
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,224 @@
+# discount_service/budget_leasing.py
+import os
+import socket
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .repositories import BudgetLeaseRepository
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+@dataclass
+class _LocalLease:
+    remaining_budget: float
+    remaining_uses: Optional[int]
+    renew_after: datetime
+    in_flight_budget: float = 0.0
+    in_flight_uses: int = 0
+
+    def covers(self, amount: float) -> bool:
+        if self.remaining_uses is not None and self.remaining_uses < 1:
+            return False
+        return self.remaining_budget >= amount
+
+
+class BudgetLeaseManager:
+    """
+    Per-process holder of campaign budget slices.
+
+    A worker leases part of a campaign's remaining total_budget and
+    max_uses_overall from the DB and then reserves against it in memory, so
+    the apply path no longer sums / counts all redemptions of a hot campaign
+    on every call. Each redemption decrements the worker's own lease row in
+    the same transaction, so the rows always hold what is really unused.
+    When a grant is computed, the slices held by other live workers and this
+    worker's uncommitted reservations are subtracted from what is left, so
+    the sum of all grants never exceeds the global caps.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        budget_slice: float = 500.0,
+        uses_slice: int = 50,
+        ttl_seconds: int = 300,
+        worker_id: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.budget_slice = budget_slice
+        self.uses_slice = uses_slice
+        self.ttl = timedelta(seconds=ttl_seconds)
+        # Renew locally before the DB row expires so an in-use slice is never
+        # handed out again to another worker.
+        self.renew_margin = self.ttl / 5
+        self.worker_id = worker_id or default_worker_id()
+        self._leases: Dict[int, _LocalLease] = {}
+        # _lock guards the in-memory leases and is never held across DB
+        # I/O; renewals serialise per campaign on _renew_locks instead.
+        self._lock = threading.Lock()
+        self._renew_locks: Dict[int, threading.Lock] = {}
+
+    def reserve(self, db: Session, campaign_id: int, amount: float) -> float:
+        """
+        Take one use and up to `amount` of budget from the local slice,
+        renewing it from the DB when needed. Returns the reserved amount,
+        which is lower than requested only when the campaign budget is
+        nearly exhausted. Every reservation must be recorded with
+        record_use() and then settled with confirm() or release().
+
+        A renewal runs and commits on `db`, the caller's session, so a
+        request never needs a second pooled connection.
+        """
+        with self._lock:
+            renew_lock = self._renew_locks.setdefault(campaign_id, threading.Lock())
+        with renew_lock:
+            now = datetime.utcnow()
+            with self._lock:
+                lease = self._leases.get(campaign_id)
+                if lease is not None and now < lease.renew_after and lease.covers(amount):
+                    return self._take(lease, amount)
+            self._renew(db, campaign_id, amount, now)
+            with self._lock:
+                return self._take(self._leases[campaign_id], amount)
+
+    @staticmethod
+    def _take(lease: _LocalLease, amount: float) -> float:
+        if lease.remaining_uses is not None and lease.remaining_uses < 1:
+            raise ValueError("Usage limit exceeded for this campaign")
+        granted = min(amount, lease.remaining_budget)
+        if granted <= 0:
+            raise ValueError("No discount applicable")
+
+        lease.remaining_budget -= granted
+        lease.in_flight_budget += granted
+        lease.in_flight_uses += 1
+        if lease.remaining_uses is not None:
+            lease.remaining_uses -= 1
+        return granted
+
+    def record_use(self, db: Session, campaign_id: int, amount: float) -> None:
+        BudgetLeaseRepository(db).consume(campaign_id, self.worker_id, amount)
+
+    def confirm(self, campaign_id: int, amount: float) -> None:
+        with self._lock:
+            lease = self._leases.get(campaign_id)
+            if lease is None:
+                return
+            lease.in_flight_budget = max(lease.in_flight_budget - amount, 0.0)
+            lease.in_flight_uses = max(lease.in_flight_uses - 1, 0)
+
+    def release(self, campaign_id: int, amount: float) -> None:
+        with self._lock:
+            lease = self._leases.get(campaign_id)
+            if lease is None:
+                return
+            lease.in_flight_budget = max(lease.in_flight_budget - amount, 0.0)
+            lease.in_flight_uses = max(lease.in_flight_uses - 1, 0)
+            lease.remaining_budget += amount
+            if lease.remaining_uses is not None:
+                lease.remaining_uses += 1
+
+    def return_all(self) -> None:
+        """Hand unused slices back to the pool, e.g. at worker shutdown."""
+        # Snapshot under the lock, write without it: reserve()/release()
+        # keep running while the rows are updated.
+        with self._lock:
+            in_flight = {
+                campaign_id: (lease.in_flight_budget, lease.in_flight_uses)
+                for campaign_id, lease in self._leases.items()
+            }
+        db = self.session_factory()
+        try:
+            repo = BudgetLeaseRepository(db)
+            returned = []
+            for row in repo.list_for_worker(self.worker_id):
+                returned.append(row.campaign_id)
+                in_flight_budget, in_flight_uses = in_flight.get(row.campaign_id, (0.0, 0))
+                if in_flight_budget <= 0 and in_flight_uses <= 0:
+                    db.delete(row)
+                    continue
+                row.remaining_budget = in_flight_budget
+                if row.remaining_uses is not None:
+                    row.remaining_uses = in_flight_uses
+                row.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            for campaign_id in returned:
+                self._leases.pop(campaign_id, None)
+
+    def _renew(self, db: Session, campaign_id: int, amount: float, now: datetime) -> None:
+        try:
+            lease_repo = BudgetLeaseRepository(db)
+
+            campaign = lease_repo.lock_campaign(campaign_id)
+            if campaign is None:
+                raise ValueError("Campaign not found or inactive")
+
+            # Write our own row first: on SQLite this takes the write lock, so
+            # the totals read below cannot change under us before commit.
+            row = lease_repo.get_for_worker(campaign_id, self.worker_id)
+            if row is None:
+                row = models.CampaignBudgetLease(
+                    campaign_id=campaign_id,
+                    worker_id=self.worker_id,
+                    remaining_budget=0.0,
+                )
+                db.add(row)
+            row.updated_at = now
+            row.expires_at = now + self.ttl
+            db.flush()
+
+            with self._lock:
+                previous = self._leases.get(campaign_id)
+                in_flight_budget = previous.in_flight_budget if previous else 0.0
+                in_flight_uses = previous.in_flight_uses if previous else 0
+
+            # One statement, so one snapshot: read separately on Postgres
+            # READ COMMITTED, another worker's redemption could commit in
+            # between and be missing from both `spent` and its lease row.
+            spent, used, others_budget, others_uses = lease_repo.get_grant_totals(
+                campaign_id, self.worker_id, now
+            )
+            free_budget = campaign.total_budget - spent - others_budget - in_flight_budget
+            grant_budget = max(0.0, min(free_budget, max(self.budget_slice, amount)))
+
+            grant_uses: Optional[int] = None
+            if campaign.max_uses_overall is not None:
+                free_uses = campaign.max_uses_overall - used - others_uses - in_flight_uses
+                grant_uses = max(0, min(free_uses, self.uses_slice))
+
+            row.remaining_budget = grant_budget + in_flight_budget
+            row.remaining_uses = (
+                None if grant_uses is None else grant_uses + in_flight_uses
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        renew_after = now + self.ttl - self.renew_margin
+        with self._lock:
+            lease = self._leases.get(campaign_id)
+            if lease is None:
+                self._leases[campaign_id] = _LocalLease(
+                    remaining_budget=grant_budget,
+                    remaining_uses=grant_uses,
+                    renew_after=renew_after,
+                )
+            else:
+                # Update in place: confirm()/release() of reservations made
+                # before the renewal keep settling against this object.
+                lease.remaining_budget = grant_budget
+                lease.remaining_uses = grant_uses
+                lease.renew_after = renew_after
@@ -0,0 +1,159 @@
+# discount_service/config.py
+import os
+from dataclasses import dataclass
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    return int(raw) if raw not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    return float(raw) if raw not in (None, "") else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Database engine. Any SQLAlchemy URL works; SQLite and Postgres
+    # (postgresql+psycopg://...) are the supported profiles.
+    database_url: str = "sqlite:///./campaigns.db"
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: int = 30
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+    # 0 disables; applied per connection on Postgres.
+    db_statement_timeout_ms: int = 0
+
+    # Read-only endpoints use a separate engine: db_read_url (a replica) when
+    # set, otherwise a read-only pool on database_url. A customer's reads go
+    # to the primary for read_your_writes_seconds after they apply.
+    db_read_routing: bool = True
+    db_read_url: str = ""
+    read_your_writes_seconds: float = 5.0
+
+    # Startup (lifespan): verify the schema once, creating missing tables
+    # when allowed, then load live campaigns into memory before reporting
+    # ready.
+    db_create_schema: bool = True
+    warm_up_on_startup: bool = True
+
+    # SQLite pragmas applied on every new connection; "" / 0 keeps the
+    # SQLite default for that pragma.
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kib: int = 65536
+    sqlite_mmap_size_bytes: int = 268435456
+
+    # Budget leasing: each worker holds a slice of a campaign's remaining
+    # budget / overall uses and redeems against it without re-counting
+    # redemptions on every apply.
+    budget_leasing_enabled: bool = False
+    budget_lease_slice: float = 500.0
+    budget_lease_uses_slice: int = 50
+    budget_lease_ttl_seconds: int = 300
+
+    # Daily rollups behind the stats endpoints, folded by
+    # `python -m discount_service.rollups` run on a schedule. With
+    # rollup_on_read each stats request first folds at most one batch of
+    # new redemptions itself, on a write session (off: reads never write).
+    rollup_batch_size: int = 5000
+    # The watermark advances by redemption id; on Postgres ids can commit
+    # out of order, and a row committed below the watermark is never
+    # folded. The settle window keeps the last few seconds out of each run.
+    rollup_settle_seconds: float = 5.0
+    rollup_on_read: bool = False
+
+    # Prometheus metrics at /metrics: request latency, DiscountService stage
+    # timings and SQL statements per request. Off: no middleware, no engine
+    # event listeners, and /metrics returns 404.
+    metrics_enabled: bool = False
+
+    # On-demand profiling: a request carrying X-Profile-Token equal to
+    # profiling_token, or a profiling_sample_rate share of all requests, is
+    # profiled. Sampled profiles are kept only above profiling_slow_ms.
+    profiling_enabled: bool = False
+    profiling_token: str = ""
+    profiling_sample_rate: float = 0.0
+    profiling_slow_ms: float = 250.0
+    profiling_dir: str = "./profiles"
+    profiling_keep: int = 200
+
+    # Admission control for /discounts/apply and /discounts/available:
+    # concurrent requests admitted, requests allowed to wait beyond that
+    # (the rest get 429) and how long they wait (then 503). Available
+    # answers turn provisional once admission_available_degrade_at of them
+    # are in flight (0: never) or while apply requests are queued.
+    admission_enabled: bool = False
+    admission_apply_concurrency: int = 16
+    admission_apply_queue: int = 64
+    admission_available_concurrency: int = 24
+    admission_available_queue: int = 96
+    admission_queue_timeout_ms: int = 1000
+    admission_available_degrade_at: int = 16
+
+    # How stale the in-memory coupon-code index may get before a code
+    # lookup re-syncs it from the campaign change feed.
+    code_index_max_staleness_ms: int = 1000
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=os.getenv("DISCOUNT_DATABASE_URL", "sqlite:///./campaigns.db"),
+            db_echo=_env_bool("DISCOUNT_DB_ECHO", False),
+            db_pool_size=_env_int("DISCOUNT_DB_POOL_SIZE", 5),
+            db_max_overflow=_env_int("DISCOUNT_DB_MAX_OVERFLOW", 10),
+            db_pool_timeout_seconds=_env_int("DISCOUNT_DB_POOL_TIMEOUT_SECONDS", 30),
+            db_pool_recycle_seconds=_env_int("DISCOUNT_DB_POOL_RECYCLE_SECONDS", 1800),
+            db_pool_pre_ping=_env_bool("DISCOUNT_DB_POOL_PRE_PING", True),
+            db_statement_timeout_ms=_env_int("DISCOUNT_DB_STATEMENT_TIMEOUT_MS", 0),
+            db_read_routing=_env_bool("DISCOUNT_DB_READ_ROUTING", True),
+            db_read_url=os.getenv("DISCOUNT_DB_READ_URL", ""),
+            read_your_writes_seconds=_env_float("DISCOUNT_READ_YOUR_WRITES_SECONDS", 5.0),
+            db_create_schema=_env_bool("DISCOUNT_DB_CREATE_SCHEMA", True),
+            warm_up_on_startup=_env_bool("DISCOUNT_WARM_UP_ON_STARTUP", True),
+            sqlite_journal_mode=os.getenv("DISCOUNT_SQLITE_JOURNAL_MODE", "WAL"),
+            sqlite_synchronous=os.getenv("DISCOUNT_SQLITE_SYNCHRONOUS", "NORMAL"),
+            sqlite_busy_timeout_ms=_env_int("DISCOUNT_SQLITE_BUSY_TIMEOUT_MS", 5000),
+            sqlite_cache_size_kib=_env_int("DISCOUNT_SQLITE_CACHE_SIZE_KIB", 65536),
+            sqlite_mmap_size_bytes=_env_int("DISCOUNT_SQLITE_MMAP_SIZE_BYTES", 268435456),
+            budget_leasing_enabled=_env_bool("DISCOUNT_BUDGET_LEASING", False),
+            budget_lease_slice=_env_float("DISCOUNT_BUDGET_LEASE_SLICE", 500.0),
+            budget_lease_uses_slice=_env_int("DISCOUNT_BUDGET_LEASE_USES_SLICE", 50),
+            budget_lease_ttl_seconds=_env_int("DISCOUNT_BUDGET_LEASE_TTL_SECONDS", 300),
+            rollup_batch_size=_env_int("DISCOUNT_ROLLUP_BATCH_SIZE", 5000),
+            rollup_settle_seconds=_env_float("DISCOUNT_ROLLUP_SETTLE_SECONDS", 5.0),
+            rollup_on_read=_env_bool("DISCOUNT_ROLLUP_ON_READ", False),
+            metrics_enabled=_env_bool("DISCOUNT_METRICS", False),
+            profiling_enabled=_env_bool("DISCOUNT_PROFILING", False),
+            profiling_token=os.getenv("DISCOUNT_PROFILING_TOKEN", ""),
+            profiling_sample_rate=_env_float("DISCOUNT_PROFILING_SAMPLE_RATE", 0.0),
+            profiling_slow_ms=_env_float("DISCOUNT_PROFILING_SLOW_MS", 250.0),
+            profiling_dir=os.getenv("DISCOUNT_PROFILING_DIR", "./profiles"),
+            profiling_keep=_env_int("DISCOUNT_PROFILING_KEEP", 200),
+            admission_enabled=_env_bool("DISCOUNT_ADMISSION", False),
+            admission_apply_concurrency=_env_int("DISCOUNT_ADMISSION_APPLY_CONCURRENCY", 16),
+            admission_apply_queue=_env_int("DISCOUNT_ADMISSION_APPLY_QUEUE", 64),
+            admission_available_concurrency=_env_int(
+                "DISCOUNT_ADMISSION_AVAILABLE_CONCURRENCY", 24
+            ),
+            admission_available_queue=_env_int("DISCOUNT_ADMISSION_AVAILABLE_QUEUE", 96),
+            admission_queue_timeout_ms=_env_int("DISCOUNT_ADMISSION_QUEUE_TIMEOUT_MS", 1000),
+            admission_available_degrade_at=_env_int(
+                "DISCOUNT_ADMISSION_AVAILABLE_DEGRADE_AT", 16
+            ),
+            code_index_max_staleness_ms=_env_int("DISCOUNT_CODE_INDEX_MAX_STALENESS_MS", 1000),
+        )
+
+
+settings = Settings.from_env()
@@ -1,24 +1,223 @@
 # discount_service/database.py
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.schema import CreateColumn
+
+from .config import Settings, settings
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _sqlite_pragmas(cfg: Settings, read_only: bool = False) -> list:
+    pragmas = []
+    if read_only:
+        # journal_mode is persistent and set by the writer side.
+        pragmas.append("PRAGMA query_only=ON")
+    elif cfg.sqlite_journal_mode:
+        mode = cfg.sqlite_journal_mode.upper()
+        if mode not in _JOURNAL_MODES:
+            raise ValueError(f"Unsupported SQLite journal_mode: {cfg.sqlite_journal_mode}")
+        pragmas.append(f"PRAGMA journal_mode={mode}")
+    if cfg.sqlite_synchronous:
+        mode = cfg.sqlite_synchronous.upper()
+        if mode not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"Unsupported SQLite synchronous: {cfg.sqlite_synchronous}")
+        pragmas.append(f"PRAGMA synchronous={mode}")
+    if cfg.sqlite_cache_size_kib:
+        # Negative cache_size is in KiB rather than pages.
+        pragmas.append(f"PRAGMA cache_size=-{int(cfg.sqlite_cache_size_kib)}")
+    if cfg.sqlite_mmap_size_bytes:
+        pragmas.append(f"PRAGMA mmap_size={int(cfg.sqlite_mmap_size_bytes)}")
+    return pragmas
+
+
+def _is_in_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def build_engine(cfg: Settings, read_only: bool = False) -> Engine:
+    raw_url = cfg.database_url
+    if read_only and cfg.db_read_url:
+        raw_url = cfg.db_read_url
+    url = make_url(raw_url)
+    backend = url.get_backend_name()
+    in_memory = _is_in_memory(url)
+
+    kwargs = {"echo": cfg.db_echo, "pool_pre_ping": cfg.db_pool_pre_ping}
+    connect_args = {}
+    if backend == "sqlite":
+        connect_args["check_same_thread"] = False
+        # pysqlite's timeout is SQLite's busy_timeout, in seconds.
+        if cfg.sqlite_busy_timeout_ms:
+            connect_args["timeout"] = cfg.sqlite_busy_timeout_ms / 1000.0
+    elif backend == "postgresql":
+        options = []
+        if cfg.db_statement_timeout_ms:
+            options.append(f"-c statement_timeout={int(cfg.db_statement_timeout_ms)}")
+        if read_only:
+            options.append("-c default_transaction_read_only=on")
+        if options:
+            connect_args["options"] = " ".join(options)
+
+    if not in_memory:
+        kwargs.update(
+            pool_size=cfg.db_pool_size,
+            max_overflow=cfg.db_max_overflow,
+            pool_timeout=cfg.db_pool_timeout_seconds,
+            pool_recycle=cfg.db_pool_recycle_seconds,
+        )
+
+    engine = create_engine(url, connect_args=connect_args, **kwargs)
+
+    pragmas = (
+        _sqlite_pragmas(cfg, read_only=read_only)
+        if backend == "sqlite" and not in_memory
+        else []
+    )
+    if pragmas:
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return engine
+
+
+def build_read_engine(cfg: Settings, write_engine: Engine) -> Engine:
+    # An in-memory SQLite database exists only on the write engine's
+    # connections, so reads have to share it.
+    if not cfg.db_read_routing or (
+        not cfg.db_read_url and _is_in_memory(make_url(cfg.database_url))
+    ):
+        return write_engine
+    return build_engine(cfg, read_only=True)
+
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./campaigns.db"
+class RecentWriters:
+    """Keys (customer ids) that wrote recently and must read from the primary."""
+
+    def __init__(self, window_seconds: float, max_entries: int = 100_000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, key: str) -> None:
+        if self.window_seconds <= 0:
+            return
+        with self._lock:
+            self._expiry[key] = time.monotonic() + self.window_seconds
+            self._expiry.move_to_end(key)
+            while len(self._expiry) > self.max_entries:
+                self._expiry.popitem(last=False)
+
+    def is_recent(self, key: str) -> bool:
+        if self.window_seconds <= 0:
+            return False
+        with self._lock:
+            expiry = self._expiry.get(key)
+            if expiry is None:
+                return False
+            if expiry < time.monotonic():
+                del self._expiry[key]
+                return False
+            return True
+
+
+class Database:
+    """Write and read engines plus their session factories for one Settings."""
+
+    def __init__(self, cfg: Settings):
+        self.settings = cfg
+        self.engine = build_engine(cfg)
+        self.read_engine = build_read_engine(cfg, self.engine)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.ReadSessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.read_engine
+        )
+        self.recent_writers = RecentWriters(cfg.read_your_writes_seconds)
+
+    def dispose(self) -> None:
+        if self.read_engine is not self.engine:
+            self.read_engine.dispose()
+        self.engine.dispose()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def verify_schema(engine: Engine, create_missing: bool) -> None:
+    """
+    Check that every mapped table and column exists. Missing tables are
+    created when create_missing is set, and so are missing columns that
+    existing rows can take without a backfill (nullable, or with a server
+    default); any other missing column fails, since that needs a migration.
+    """
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    missing = [t for t in Base.metadata.sorted_tables if t.name not in existing]
+    if missing:
+        names = ", ".join(t.name for t in missing)
+        if not create_missing:
+            raise RuntimeError(f"Database schema is missing tables: {names}")
+        Base.metadata.create_all(bind=engine, tables=missing)
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        missing_columns = [c for c in table.columns if c.name not in columns]
+        if not missing_columns:
+            continue
+        addable = all(c.nullable or c.server_default is not None for c in missing_columns)
+        if not (create_missing and addable):
+            names = ", ".join(c.name for c in missing_columns)
+            raise RuntimeError(
+                f"Table {table.name} is missing columns {names}; migrate the database"
+            )
+        table_name = engine.dialect.identifier_preparer.format_table(table)
+        with engine.begin() as conn:
+            for column in missing_columns:
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {ddl}")
+
+
+# Default database for scripts and the module-level app. Creating an engine
+# does not connect; nothing touches the DB until a session is used.
+default_database = Database(settings)
+engine = default_database.engine
+read_engine = default_database.read_engine
+SessionLocal = default_database.SessionLocal
+ReadSessionLocal = default_database.ReadSessionLocal
+recent_writers = default_database.recent_writers
+
+
 # FastAPI dependency
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
 
 
-def get_db() -> Session:
-    db = SessionLocal()
+def get_db(request: Request) -> Session:
+    db = request.app.state.database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request) -> Session:
+    db = request.app.state.database.ReadSessionLocal()
     try:
         yield db
     finally:
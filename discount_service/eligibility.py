@@ -0,0 +1,215 @@
+# discount_service/eligibility.py
+"""
+Campaigns compiled into flat, immutable rule records.
+
+The /discounts/available loop used to walk ORM Campaign instances, paying
+for attribute instrumentation, enum comparisons and several method calls
+per campaign. A CampaignRule resolves all of that once: scope becomes a
+bool selecting the base amount, nulls become neutral values and the
+discount strategy is pre-bound, so evaluate() is one tight function.
+Compiling costs about as much as the old loop, so rules are cached per
+process and only recompiled after a campaign write.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .discount_strategies import DiscountStrategyFactory
+from .repositories import CampaignChangeRepository, CampaignRepository
+
+_NO_MINIMUM = float("-inf")
+
+
+class CampaignRule(NamedTuple):
+    # Named like the Campaign columns, so usage-limit checks accept a rule.
+    id: int
+    priority: int
+    start_date: datetime
+    end_date: datetime
+    # True: discount is taken off cart_total, False: off delivery_charge.
+    is_cart: bool
+    # None means every customer is targeted.
+    targets: Optional[FrozenSet[str]]
+    min_cart_total: float
+    min_delivery_charge: float
+    discount_value: float
+    max_discount_amount: Optional[float]
+    compute: Callable[[float, float, Optional[float], float], float]
+    total_budget: float
+    max_transactions_per_customer_per_day: int
+    max_uses_overall: Optional[int]
+    code: Optional[str]
+
+
+def normalize_code(code: str) -> str:
+    """Coupon codes are matched case-insensitively, ignoring outer spaces."""
+    return code.strip().casefold()
+
+
+def compile_campaign(campaign: models.Campaign) -> CampaignRule:
+    targets = campaign.targets
+    return CampaignRule(
+        id=campaign.id,
+        priority=campaign.priority,
+        start_date=campaign.start_date,
+        end_date=campaign.end_date,
+        is_cart=campaign.discount_scope == models.DiscountScope.CART,
+        targets=frozenset(t.customer_id for t in targets) if targets else None,
+        min_cart_total=(
+            _NO_MINIMUM if campaign.min_cart_total is None else campaign.min_cart_total
+        ),
+        min_delivery_charge=(
+            _NO_MINIMUM
+            if campaign.min_delivery_charge is None
+            else campaign.min_delivery_charge
+        ),
+        discount_value=campaign.discount_value,
+        max_discount_amount=campaign.max_discount_amount,
+        compute=DiscountStrategyFactory.get_strategy(campaign.discount_value_type).compute,
+        total_budget=campaign.total_budget,
+        max_transactions_per_customer_per_day=campaign.max_transactions_per_customer_per_day,
+        max_uses_overall=campaign.max_uses_overall,
+        code=campaign.code,
+    )
+
+
+def evaluate(
+    rule: CampaignRule, customer_id: str, cart_total: float, delivery_charge: float
+) -> float:
+    """
+    Discount the campaign would give this cart before the remaining-budget
+    and usage caps (which need the DB), or 0.0 when a static rule fails.
+    """
+    targets = rule.targets
+    if targets is not None and customer_id not in targets:
+        return 0.0
+    if cart_total < rule.min_cart_total or delivery_charge < rule.min_delivery_charge:
+        return 0.0
+    return rule.compute(
+        cart_total if rule.is_cart else delivery_charge,
+        rule.discount_value,
+        rule.max_discount_amount,
+        rule.total_budget,
+    )
+
+
+class CampaignRuleCache:
+    """
+    In-memory copy of every live campaign (active, not yet ended): its
+    compiled rule plus the rendered response object, ordered like
+    CampaignRepository.get_active_for_now. sync() follows the campaign
+    change feed and reloads only the campaigns written since the last call,
+    so a warm worker answers /discounts/available without loading campaign
+    rows. Writes that bypass CampaignRepository (and so the change feed)
+    are only picked up by a full reload.
+
+    It also indexes live campaigns by normalized coupon code. Code lookups
+    re-sync at most every `code_max_staleness` seconds, so unknown codes
+    (guessing traffic included) are answered from memory without touching
+    the database; writes made through this worker call mark_stale() and are
+    seen at once, other workers' writes within that bound.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[models.Campaign], Any],
+        max_changes: int = 1000,
+        clock: Callable[[], datetime] = datetime.utcnow,
+        code_max_staleness: float = 1.0,
+    ):
+        self.render = render
+        self.max_changes = max_changes
+        self.clock = clock
+        self.code_max_staleness = code_max_staleness
+        self._entries: Dict[int, Tuple[CampaignRule, Any]] = {}
+        self._ordered: List[Tuple[CampaignRule, Any]] = []
+        self._codes: Dict[str, Tuple[CampaignRule, Any]] = {}
+        self._version: Optional[int] = None
+        self._synced_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def sync(self, db: Session) -> None:
+        synced_at = time.monotonic()
+        changes_repo = CampaignChangeRepository(db)
+        version = changes_repo.get_current_version()
+        # Callers sync from whichever session they hold: the primary, or a
+        # replica lagging behind it. A lower version is older data than the
+        # cache already has, so the cache never moves backwards.
+        if self._version is not None and version <= self._version:
+            self._synced_at = synced_at
+            return
+        with self._lock:
+            if self._version is not None and version <= self._version:
+                return
+            campaign_repo = CampaignRepository(db)
+            now = self.clock()
+            changes = None
+            if self._version is not None:
+                changes = changes_repo.list_since(self._version, self.max_changes + 1)
+                if len(changes) > self.max_changes:
+                    changes = None
+
+            if changes is None:
+                entries = {c.id: self._build(c) for c in campaign_repo.get_live(now)}
+            else:
+                entries = {
+                    cid: entry
+                    for cid, entry in self._entries.items()
+                    if entry[0].end_date >= now
+                }
+                changed_ids = {change.campaign_id for change in changes}
+                for cid in changed_ids:
+                    entries.pop(cid, None)
+                for campaign in campaign_repo.get_many(list(changed_ids)):
+                    if campaign.is_active and campaign.end_date >= now:
+                        entries[campaign.id] = self._build(campaign)
+
+            # Readers iterate the previous list undisturbed; swap in new ones.
+            self._entries = entries
+            self._ordered = sorted(
+                entries.values(), key=lambda entry: (-entry[0].priority, entry[0].id)
+            )
+            # Codes are unique only case-sensitively; on a clash after
+            # normalizing, the campaign listed first (highest priority) wins.
+            self._codes = {
+                normalize_code(entry[0].code): entry
+                for entry in reversed(self._ordered)
+                if entry[0].code
+            }
+            self._version = version
+            self._synced_at = synced_at
+
+    def mark_stale(self) -> None:
+        self._synced_at = float("-inf")
+
+    def find_code(
+        self, db: Session, code: str, now: datetime
+    ) -> Optional[Tuple[CampaignRule, Any]]:
+        """The running campaign with this coupon code, or None."""
+        if time.monotonic() - self._synced_at >= self.code_max_staleness:
+            self.sync(db)
+        entry = self._codes.get(normalize_code(code))
+        if entry is None or not (entry[0].start_date <= now <= entry[0].end_date):
+            return None
+        return entry
+
+    def active(self, now: datetime) -> List[Tuple[CampaignRule, Any]]:
+        return [
+            entry
+            for entry in self._ordered
+            if entry[0].start_date <= now <= entry[0].end_date
+        ]
+
+    def _build(self, campaign: models.Campaign) -> Tuple[CampaignRule, Any]:
+        return compile_campaign(campaign), self.render(campaign)
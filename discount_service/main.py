@@ -1,33 +1,176 @@
 # discount_service/main.py
 import math
+import secrets
+import time
+from contextlib import asynccontextmanager
+from datetime import date
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 
-from typing import List
+from typing import List, Optional
 
-from .database import Base, engine, get_db
+from .database import Database, default_database, get_db, get_read_db, verify_schema
 from . import models, schemas
-from .repositories import CampaignRepository, DiscountRepository
+from .admission import (
+    AdmissionController,
+    AdmissionLimiter,
+    AdmissionMiddleware,
+    DeadlineExceeded,
+    deadline_exceeded,
+    is_degraded,
+    request_deadline,
+)
+from .budget_leasing import BudgetLeaseManager
+from .config import Settings, settings
+from .eligibility import CampaignRuleCache
+from .metrics import Metrics, MetricsMiddleware
+from .profiling import ProfileStore, ProfilingMiddleware, instrument_engine
+from .repositories import (
+    CampaignChangeRepository,
+    CampaignRepository,
+    DiscountRepository,
+    RollupRepository,
+)
+from .rollups import REDEMPTIONS_WATERMARK, RollupCompactor
 from .services import DiscountService
 
-Base.metadata.create_all(bind=engine)
+router = APIRouter()
 
-app = FastAPI(
-    title="Campaign Management & Discount Service",
-    description="APIs for managing discount campaigns and resolving applicable discounts.",
-    version="2.0.0",
-)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    state = app.state
+    started = time.perf_counter()
+    verify_schema(state.database.engine, create_missing=state.settings.db_create_schema)
+    if state.settings.warm_up_on_startup:
+        db = state.database.ReadSessionLocal()
+        try:
+            state.rule_cache.sync(db)
+        finally:
+            db.close()
+    state.startup_seconds = time.perf_counter() - started
+    state.ready = True
+    try:
+        yield
+    finally:
+        state.ready = False
+        if state.budget_leases is not None:
+            state.budget_leases.return_all()
 
 
-def get_discount_service(db: Session = Depends(get_db)) -> DiscountService:
+def get_discount_service(
+    request: Request, db: Session = Depends(get_db)
+) -> DiscountService:
     camp_repo = CampaignRepository(db)
     disc_repo = DiscountRepository(db)
-    return DiscountService(camp_repo, disc_repo)
+    return DiscountService(
+        camp_repo,
+        disc_repo,
+        budget_leases=request.app.state.budget_leases,
+        rule_cache=request.app.state.rule_cache,
+        metrics=request.app.state.metrics,
+    )
+
+
+def get_quote_db(request: Request, req: schemas.DiscountCheckRequest) -> Session:
+    # Read-your-writes: right after a customer applies, a lagging read side
+    # could still offer them the campaign they just used up.
+    database = request.app.state.database
+    if database.recent_writers.is_recent(req.customer_id):
+        db = database.SessionLocal()
+    else:
+        db = database.ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_quote_discount_service(
+    request: Request, db: Session = Depends(get_quote_db)
+) -> DiscountService:
+    return DiscountService(
+        CampaignRepository(db),
+        DiscountRepository(db),
+        rule_cache=request.app.state.rule_cache,
+        metrics=request.app.state.metrics,
+    )
+
+
+@router.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+def readiness(request: Request):
+    state = request.app.state
+    if not state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {
+        "status": "ready",
+        "startup_seconds": round(state.startup_seconds, 4),
+        "cached_campaigns": len(state.rule_cache),
+        "admission": state.admission.snapshot() if state.admission is not None else None,
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics(request: Request):
+    registry = request.app.state.metrics
+    if registry is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/debug/profiles", response_model=List[schemas.RequestProfileOut])
+def list_profiles(
+    request: Request,
+    limit: int = Query(20, ge=1, le=200),
+    min_ms: float = Query(0.0, ge=0),
+):
+    state = request.app.state
+    if state.profile_store is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    # Profiles expose SQL and timings: never list them without a token,
+    # even when only sampling is configured.
+    token = state.settings.profiling_token
+    if not token:
+        raise HTTPException(
+            status_code=403, detail="Set DISCOUNT_PROFILING_TOKEN to list profiles"
+        )
+    if not secrets.compare_digest(request.headers.get("x-profile-token", ""), token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+    return state.profile_store.list(limit, min_ms)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
 
 
-@app.post("/campaigns", response_model=schemas.CampaignOut)
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    # Caches may keep the body but must revalidate before reusing it.
+    response.headers["Cache-Control"] = "no-cache"
+
+
+@router.post("/campaigns", response_model=schemas.CampaignOut)
 def create_campaign(
+    request: Request,
     campaign_in: schemas.CampaignCreate,
     db: Session = Depends(get_db),
 ):
@@ -62,15 +205,25 @@ def create_campaign(
         ]
 
     campaign = camp_repo.create(campaign)
+    request.app.state.rule_cache.mark_stale()
     return service._to_campaign_out(campaign)
 
 
-@app.get("/campaigns", response_model=schemas.CampaignPage)
+@router.get("/campaigns", response_model=schemas.CampaignPage)
 def list_campaigns(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
+    # Every campaign write advances the change-feed counter, so its value
+    # identifies the state of the whole collection (and so of any page).
+    etag = f'"campaigns-{CampaignChangeRepository(db).get_current_version()}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    _set_etag(response, etag)
+
     camp_repo = CampaignRepository(db)
     discount_repo = DiscountRepository(db)
     service = DiscountService(camp_repo, discount_repo)
@@ -87,23 +240,187 @@ def list_campaigns(
     )
 
 
-@app.get("/campaigns/{campaign_id}", response_model=schemas.CampaignOut)
+@router.get("/campaigns/changes", response_model=schemas.CampaignChangesPage)
+def list_campaign_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_read_db),
+):
+    camp_repo = CampaignRepository(db)
+    discount_repo = DiscountRepository(db)
+    service = DiscountService(camp_repo, discount_repo)
+
+    changes = CampaignChangeRepository(db).list_since(since, limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Several writes to one campaign inside the window collapse into its
+    # latest change; consumers only need the current state.
+    latest = {}
+    for change in changes:
+        latest[change.campaign_id] = change
+    live_ids = [
+        cid for cid, ch in latest.items() if ch.op != models.CampaignChangeOp.DELETED
+    ]
+    campaigns = {c.id: c for c in camp_repo.get_many(live_ids)}
+
+    out = []
+    for change in sorted(latest.values(), key=lambda ch: ch.version):
+        campaign = campaigns.get(change.campaign_id)
+        if change.op != models.CampaignChangeOp.DELETED and campaign is None:
+            # Deleted by a change beyond this window.
+            out.append(
+                schemas.CampaignChangeOut(
+                    version=change.version,
+                    campaign_id=change.campaign_id,
+                    op=models.CampaignChangeOp.DELETED,
+                )
+            )
+            continue
+        out.append(
+            schemas.CampaignChangeOut(
+                version=change.version,
+                campaign_id=change.campaign_id,
+                op=change.op,
+                campaign=service._to_campaign_out(campaign) if campaign else None,
+            )
+        )
+
+    return schemas.CampaignChangesPage(
+        changes=out,
+        last_version=changes[-1].version if changes else since,
+        has_more=has_more,
+    )
+
+
+@router.get("/campaigns/{campaign_id}", response_model=schemas.CampaignOut)
 def get_campaign(
+    request: Request,
+    response: Response,
     campaign_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     camp_repo = CampaignRepository(db)
     discount_repo = DiscountRepository(db)
     service = DiscountService(camp_repo, discount_repo)
 
+    # Revalidation costs one indexed column lookup, no ORM load.
+    version = camp_repo.get_version(campaign_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    etag = f'"campaign-{campaign_id}-{version}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
     campaign = camp_repo.get(campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
+    # A write may land between the two reads; tag what is returned.
+    _set_etag(response, f'"campaign-{campaign.id}-{campaign.version}"')
     return service._to_campaign_out(campaign)
 
 
-@app.put("/campaigns/{campaign_id}", response_model=schemas.CampaignOut)
+def _refresh_rollups(request: Request, db: Session) -> int:
+    """Watermark the stats are read at; `db` is the read session."""
+    state = request.app.state
+    if state.settings.rollup_on_read:
+        # Opt-in: compaction writes, so it needs a write session and
+        # contends with /discounts/apply for the write lock.
+        write_db = state.database.SessionLocal()
+        try:
+            state.rollup_compactor.compact(
+                write_db, max_rows=state.settings.rollup_batch_size
+            )
+        finally:
+            write_db.close()
+    return RollupRepository(db).get_watermark(REDEMPTIONS_WATERMARK)
+
+
+@router.get("/campaigns/{campaign_id}/stats", response_model=schemas.CampaignStatsDetail)
+def get_campaign_stats(
+    request: Request,
+    campaign_id: int,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_read_db),
+):
+    camp_repo = CampaignRepository(db)
+    campaign = camp_repo.get(campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    as_of = _refresh_rollups(request, db)
+    rollup_repo = RollupRepository(db)
+    days = rollup_repo.list_daily_for_campaign(campaign_id, start_date, end_date)
+    redemptions, total_discount, unique_customers = rollup_repo.get_totals_for_campaigns(
+        [campaign_id], start_date, end_date
+    ).get(campaign_id, (0, 0.0, 0))
+
+    return schemas.CampaignStatsDetail(
+        campaign_id=campaign.id,
+        name=campaign.name,
+        total_budget=campaign.total_budget,
+        redemptions=redemptions,
+        total_discount=total_discount,
+        unique_customers=unique_customers,
+        days=[
+            schemas.CampaignDailyStatsOut(
+                day=d.day,
+                redemptions=d.redemptions,
+                total_discount=d.total_discount,
+                unique_customers=d.unique_customers,
+            )
+            for d in days
+        ],
+        as_of_redemption_id=as_of,
+    )
+
+
+@router.get("/stats/campaigns", response_model=schemas.CampaignStatsPage)
+def list_campaign_stats(
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_read_db),
+):
+    camp_repo = CampaignRepository(db)
+    as_of = _refresh_rollups(request, db)
+
+    campaigns, total_items = camp_repo.list_paginated(page, page_size)
+    totals = RollupRepository(db).get_totals_for_campaigns(
+        [c.id for c in campaigns], start_date, end_date
+    )
+    total_pages = max(1, math.ceil(total_items / page_size)) if total_items else 1
+
+    items = []
+    for c in campaigns:
+        redemptions, total_discount, unique_customers = totals.get(c.id, (0, 0.0, 0))
+        items.append(
+            schemas.CampaignStatsOut(
+                campaign_id=c.id,
+                name=c.name,
+                total_budget=c.total_budget,
+                redemptions=redemptions,
+                total_discount=total_discount,
+                unique_customers=unique_customers,
+            )
+        )
+
+    return schemas.CampaignStatsPage(
+        items=items,
+        page=page,
+        page_size=page_size,
+        total_items=total_items,
+        total_pages=total_pages,
+        as_of_redemption_id=as_of,
+    )
+
+
+@router.put("/campaigns/{campaign_id}", response_model=schemas.CampaignOut)
 def update_campaign(
+    request: Request,
     campaign_id: int,
     campaign_in: schemas.CampaignUpdate,
     db: Session = Depends(get_db),
@@ -144,11 +461,13 @@ def update_campaign(
             campaign.targets.append(models.CampaignTargetCustomer(customer_id=cid))
 
     campaign = camp_repo.save(campaign)
+    request.app.state.rule_cache.mark_stale()
     return service._to_campaign_out(campaign)
 
 
-@app.delete("/campaigns/{campaign_id}", status_code=204)
+@router.delete("/campaigns/{campaign_id}", status_code=204)
 def delete_campaign(
+    request: Request,
     campaign_id: int,
     db: Session = Depends(get_db),
 ):
@@ -157,23 +476,169 @@ def delete_campaign(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     camp_repo.delete(campaign)
+    request.app.state.rule_cache.mark_stale()
     return
 
 
-@app.post("/discounts/available", response_model=List[schemas.AvailableCampaign])
+@router.post("/discounts/available", response_model=List[schemas.AvailableCampaign])
 def get_available_discounts(
+    request: Request,
+    response: Response,
     req: schemas.DiscountCheckRequest,
-    service: DiscountService = Depends(get_discount_service),
+    service: DiscountService = Depends(get_quote_discount_service),
 ):
+    if deadline_exceeded(request):
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    if is_degraded(request):
+        response.headers["X-Discounts-Provisional"] = "true"
+        return service.get_available_campaigns(req, provisional=True)
     return service.get_available_campaigns(req)
 
 
-@app.post("/discounts/apply", response_model=schemas.DiscountApplyResponse)
+@router.post("/discounts/apply", response_model=schemas.DiscountApplyResponse)
 def apply_discount(
+    request: Request,
     req: schemas.DiscountApplyRequest,
     service: DiscountService = Depends(get_discount_service),
 ):
+    # Waiting for a thread or a connection may have used up the client's
+    # deadline; a redemption nobody waits for would only burn budget. The
+    # service checks again right before writing it.
+    if deadline_exceeded(request):
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    try:
+        result = service.apply_discount(req, deadline=request_deadline(request))
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    request.app.state.database.recent_writers.mark(req.customer_id)
+    return result
+
+
+@router.post("/discounts/apply-by-code", response_model=schemas.DiscountApplyResponse)
+def apply_discount_by_code(
+    request: Request,
+    req: schemas.DiscountApplyByCodeRequest,
+    service: DiscountService = Depends(get_discount_service),
+):
+    if deadline_exceeded(request):
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    campaign_id = service.resolve_code(req.code)
+    if campaign_id is None:
+        raise HTTPException(status_code=404, detail="Unknown discount code")
+    apply_req = schemas.DiscountApplyRequest(
+        customer_id=req.customer_id,
+        cart_total=req.cart_total,
+        delivery_charge=req.delivery_charge,
+        campaign_id=campaign_id,
+        order_id=req.order_id,
+    )
     try:
-        return service.apply_discount(req)
+        result = service.apply_discount(
+            apply_req, code=req.code, deadline=request_deadline(request)
+        )
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    request.app.state.database.recent_writers.mark(req.customer_id)
+    return result
+
+
+@router.get("/discounts/code/{code}", response_model=schemas.CampaignCodeOut)
+def get_discount_by_code(
+    request: Request,
+    code: str,
+    db: Session = Depends(get_read_db),
+):
+    service = DiscountService(
+        CampaignRepository(db),
+        DiscountRepository(db),
+        rule_cache=request.app.state.rule_cache,
+    )
+    campaign = service.get_campaign_by_code(code)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Unknown discount code")
+    return campaign
+
+
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the app without touching the database; schema checks and the
+    campaign warm-up run once in the lifespan hook.
+    """
+    app_settings = app_settings or settings
+    database = (
+        default_database if app_settings is settings else Database(app_settings)
+    )
+
+    app = FastAPI(
+        title="Campaign Management & Discount Service",
+        description="APIs for managing discount campaigns and resolving applicable discounts.",
+        version="2.0.0",
+        lifespan=lifespan,
+    )
+    app.state.settings = app_settings
+    app.state.database = database
+    app.state.budget_leases = (
+        BudgetLeaseManager(
+            database.SessionLocal,
+            budget_slice=app_settings.budget_lease_slice,
+            uses_slice=app_settings.budget_lease_uses_slice,
+            ttl_seconds=app_settings.budget_lease_ttl_seconds,
+        )
+        if app_settings.budget_leasing_enabled
+        else None
+    )
+    app.state.rule_cache = CampaignRuleCache(
+        render=DiscountService._to_campaign_out,
+        code_max_staleness=app_settings.code_index_max_staleness_ms / 1000.0,
+    )
+    app.state.rollup_compactor = RollupCompactor(
+        batch_size=app_settings.rollup_batch_size,
+        settle_seconds=app_settings.rollup_settle_seconds,
+    )
+    app.state.admission = None
+    if app_settings.admission_enabled:
+        queue_timeout = app_settings.admission_queue_timeout_ms / 1000.0
+        app.state.admission = AdmissionController(
+            apply=AdmissionLimiter(
+                app_settings.admission_apply_concurrency,
+                app_settings.admission_apply_queue,
+                queue_timeout,
+            ),
+            available=AdmissionLimiter(
+                app_settings.admission_available_concurrency,
+                app_settings.admission_available_queue,
+                queue_timeout,
+            ),
+            degrade_available_at=app_settings.admission_available_degrade_at,
+        )
+        app.add_middleware(AdmissionMiddleware, controller=app.state.admission)
+    app.state.metrics = Metrics() if app_settings.metrics_enabled else None
+    if app.state.metrics is not None:
+        app.state.metrics.instrument_engine(database.engine)
+        app.state.metrics.instrument_engine(database.read_engine)
+        app.add_middleware(MetricsMiddleware, metrics=app.state.metrics)
+    app.state.profile_store = None
+    if app_settings.profiling_enabled:
+        app.state.profile_store = ProfileStore(
+            app_settings.profiling_dir, keep=app_settings.profiling_keep
+        )
+        instrument_engine(database.engine)
+        instrument_engine(database.read_engine)
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=app.state.profile_store,
+            token=app_settings.profiling_token,
+            sample_rate=app_settings.profiling_sample_rate,
+            slow_ms=app_settings.profiling_slow_ms,
+        )
+    app.state.ready = False
+    app.state.startup_seconds = None
+    app.include_router(router)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,265 @@
+# discount_service/metrics.py
+"""
+In-process metrics rendered in the Prometheus text format.
+
+A small self-contained registry (no client library): histograms with
+fixed buckets, guarded by one lock each. Per-request state (SQL statement
+count and time) lives in a ContextVar set by MetricsMiddleware; the
+threadpool that runs sync endpoints copies the context, so engine event
+listeners see the request they run for. With metrics disabled none of
+this is installed and DiscountService times stages against NULL_STAGES.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+
+
+class Histogram:
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            pairs = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket{_labels(pairs + [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(pairs)} {_number(series[-1])}"
+            yield f"{self.name}_count{_labels(pairs)} {cumulative}"
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class RequestStats:
+    """SQL work done on behalf of the current request."""
+
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "discount_request_stats", default=None
+)
+
+
+class StageTimings:
+    """Accumulates time per DiscountService stage for one call."""
+
+    __slots__ = ("metrics", "operation", "seconds")
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, metrics: "Metrics", operation: str):
+        self.metrics = metrics
+        self.operation = operation
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def finish(self, evaluated: Optional[int] = None, returned: Optional[int] = None) -> None:
+        self.metrics.record_stages(self.operation, self.seconds, evaluated, returned)
+
+
+class _NullStageTimings:
+    __slots__ = ()
+
+    @staticmethod
+    def clock() -> float:
+        return 0.0
+
+    def add(self, stage: str, seconds: float) -> None:
+        pass
+
+    def finish(self, evaluated: Optional[int] = None, returned: Optional[int] = None) -> None:
+        pass
+
+
+NULL_STAGES = _NullStageTimings()
+
+
+class Metrics:
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "discount_http_request_duration_seconds",
+            "HTTP request latency by route.",
+            ("method", "route", "status"),
+            LATENCY_BUCKETS,
+        )
+        self.stage_seconds = Histogram(
+            "discount_service_stage_duration_seconds",
+            "Time spent per DiscountService stage, per call.",
+            ("operation", "stage"),
+            LATENCY_BUCKETS,
+        )
+        self.db_statements = Histogram(
+            "discount_db_statements_per_request",
+            "SQL statements executed per HTTP request.",
+            ("route",),
+            COUNT_BUCKETS,
+        )
+        self.db_seconds = Histogram(
+            "discount_db_duration_seconds_per_request",
+            "Time spent executing SQL per HTTP request.",
+            ("route",),
+            LATENCY_BUCKETS,
+        )
+        self.campaigns_evaluated = Histogram(
+            "discount_campaigns_evaluated_per_request",
+            "Campaigns considered per call.",
+            ("operation",),
+            COUNT_BUCKETS,
+        )
+        self.campaigns_returned = Histogram(
+            "discount_campaigns_returned_per_request",
+            "Campaigns returned as applicable per call.",
+            ("operation",),
+            COUNT_BUCKETS,
+        )
+        self._histograms = [
+            self.request_seconds,
+            self.stage_seconds,
+            self.db_statements,
+            self.db_seconds,
+            self.campaigns_evaluated,
+            self.campaigns_returned,
+        ]
+
+    def stages(self, operation: str) -> StageTimings:
+        return StageTimings(self, operation)
+
+    def record_stages(
+        self,
+        operation: str,
+        seconds: Dict[str, float],
+        evaluated: Optional[int],
+        returned: Optional[int],
+    ) -> None:
+        for stage, value in seconds.items():
+            self.stage_seconds.observe(value, operation, stage)
+        if evaluated is not None:
+            self.campaigns_evaluated.observe(evaluated, operation)
+        if returned is not None:
+            self.campaigns_returned.observe(returned, operation)
+
+    def record_request(
+        self, method: str, route: str, status: int, seconds: float, stats: RequestStats
+    ) -> None:
+        self.request_seconds.observe(seconds, method, route, str(status))
+        self.db_statements.observe(stats.statements, route)
+        self.db_seconds.observe(stats.db_seconds, route)
+
+    def instrument_engine(self, engine: Engine) -> None:
+        if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            return
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_request.get() is not None:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_request.get()
+    started = conn.info.get("metrics_started")
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.db_seconds += time.perf_counter() - started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request and collecting its SQL stats."""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            route = scope.get("route")
+            # Route templates, not raw paths, keep label cardinality bounded.
+            self.metrics.record_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - started,
+                stats,
+            )
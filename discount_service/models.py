@@ -8,6 +8,7 @@ from sqlalchemy import (
     String,
     Float,
     Boolean,
+    Date,
     DateTime,
     ForeignKey,
     Enum,
@@ -28,6 +29,12 @@ class DiscountValueType(str, enum.Enum):
     FLAT = "flat"
 
 
+class CampaignChangeOp(str, enum.Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+
 class Campaign(Base):
     __tablename__ = "campaigns"
 
@@ -59,6 +66,11 @@ class Campaign(Base):
 
     is_active = Column(Boolean, default=True, nullable=False)
 
+    # campaign_changes version of the latest write to this campaign or its
+    # targets; versions are global, so (id, version) never repeats even if
+    # an id is reused. 0 for rows inserted outside CampaignRepository.
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
     targets = relationship(
         "CampaignTargetCustomer",
         back_populates="campaign",
@@ -69,6 +81,21 @@ class Campaign(Base):
         back_populates="campaign",
         cascade="all, delete-orphan",
     )
+    budget_leases = relationship(
+        "CampaignBudgetLease",
+        back_populates="campaign",
+        cascade="all, delete-orphan",
+    )
+    daily_stats = relationship(
+        "CampaignDailyStats",
+        back_populates="campaign",
+        cascade="all, delete-orphan",
+    )
+    daily_customers = relationship(
+        "CampaignDailyCustomer",
+        back_populates="campaign",
+        cascade="all, delete-orphan",
+    )
 
 
 class CampaignTargetCustomer(Base):
@@ -100,3 +127,102 @@ class DiscountRedemption(Base):
     order_id = Column(String, nullable=True, index=True)
 
     campaign = relationship("Campaign", back_populates="redemptions")
+
+
+class CampaignBudgetLease(Base):
+    """
+    Slice of a campaign's budget / overall uses currently held by one worker
+    process. remaining_* is what the worker may still hand out locally,
+    including reservations whose redemption row is not committed yet.
+    """
+
+    __tablename__ = "campaign_budget_leases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(
+        Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False
+    )
+    worker_id = Column(String, nullable=False)
+    remaining_budget = Column(Float, nullable=False, default=0.0)
+    remaining_uses = Column(Integer, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "worker_id", name="uq_campaign_worker_lease"),
+    )
+
+    campaign = relationship("Campaign", back_populates="budget_leases")
+
+
+class CampaignDailyStats(Base):
+    __tablename__ = "campaign_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(
+        Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False
+    )
+    day = Column(Date, nullable=False, index=True)
+    redemptions = Column(Integer, nullable=False, default=0)
+    total_discount = Column(Float, nullable=False, default=0.0)
+    unique_customers = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "day", name="uq_campaign_day_stats"),
+    )
+
+    campaign = relationship("Campaign", back_populates="daily_stats")
+
+
+class CampaignDailyCustomer(Base):
+    """Distinct (campaign, day, customer) set behind unique_customers."""
+
+    __tablename__ = "campaign_daily_customers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(
+        Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False
+    )
+    day = Column(Date, nullable=False)
+    customer_id = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "campaign_id", "day", "customer_id", name="uq_campaign_day_customer"
+        ),
+    )
+
+    campaign = relationship("Campaign", back_populates="daily_customers")
+
+
+class RollupWatermark(Base):
+    """Highest discount_redemptions.id already folded into the rollups."""
+
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    last_redemption_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CampaignChange(Base):
+    """
+    Append-only log of campaign writes. `version` is taken from
+    VersionCounter inside the writing transaction, so versions become
+    visible in commit order and `?since=` readers never skip one.
+    """
+
+    __tablename__ = "campaign_changes"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    # No FK: the log must outlive deleted campaigns.
+    campaign_id = Column(Integer, nullable=False, index=True)
+    op = Column(Enum(CampaignChangeOp), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class VersionCounter(Base):
+    __tablename__ = "version_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,225 @@
+# discount_service/profiling.py
+"""
+Opt-in per-request profiling.
+
+ProfilingMiddleware picks a request when it carries the configured
+X-Profile-Token header or falls into the sampling rate. For that request
+it profiles the DiscountService entry points (decorated with @profiled)
+with cProfile and captures every SQL statement with its duration. cProfile
+only sees the thread it runs in, so profiling starts inside the decorated
+call, in the threadpool thread that runs the endpoint, not in the
+middleware. Token-triggered requests are always written; sampled ones only
+when slower than the threshold. Each capture is a .prof file (load with
+pstats, snakeviz or `flameprof`) plus a .json summary the listing
+endpoint reads.
+"""
+import cProfile
+import functools
+import json
+import os
+import random
+import re
+import secrets
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_HEADER = b"x-profile-token"
+MAX_CAPTURED_STATEMENTS = 500
+
+
+class ProfileSession:
+    def __init__(self, trigger: str):
+        self.trigger = trigger
+        self.profiler = cProfile.Profile()
+        self.statements: List[dict] = []
+        self.statement_count = 0
+        self.sql_seconds = 0.0
+        self._running = False
+
+    def run(self, fn, *args, **kwargs):
+        if self._running:
+            # Nested profiled call: already inside the profiler.
+            return fn(*args, **kwargs)
+        self._running = True
+        try:
+            return self.profiler.runcall(fn, *args, **kwargs)
+        finally:
+            self._running = False
+
+    def add_statement(self, statement: str, seconds: float) -> None:
+        self.statement_count += 1
+        self.sql_seconds += seconds
+        if len(self.statements) < MAX_CAPTURED_STATEMENTS:
+            self.statements.append({"sql": statement, "ms": round(seconds * 1000, 3)})
+
+
+_active_session: ContextVar[Optional[ProfileSession]] = ContextVar(
+    "discount_profile_session", default=None
+)
+
+
+def profiled(method):
+    """Run `method` under the request's profiler when one is active."""
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        session = _active_session.get()
+        if session is None:
+            return method(*args, **kwargs)
+        return session.run(method, *args, **kwargs)
+
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_session.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    session = _active_session.get()
+    started = conn.info.get("profile_started")
+    if session is None or not started:
+        return
+    session.add_statement(statement, time.perf_counter() - started.pop())
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ProfileStore:
+    """Profile artifacts in one directory, newest `keep` retained."""
+
+    def __init__(self, directory: str, keep: int):
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, session: ProfileSession, summary: dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", summary["path"]).strip("-") or "root"
+        profile_id = (
+            f"{datetime.utcnow():%Y%m%dT%H%M%S}-{summary['method'].lower()}-{slug}"
+            f"-{secrets.token_hex(3)}"
+        )
+        base = os.path.join(self.directory, profile_id)
+        session.profiler.dump_stats(base + ".prof")
+        summary = dict(
+            summary,
+            id=profile_id,
+            # Relative to the profiles directory; no server paths in responses.
+            profile_file=profile_id + ".prof",
+            sql=session.statements,
+        )
+        with open(base + ".json", "w") as fh:
+            json.dump(summary, fh)
+        self._prune()
+        return profile_id
+
+    def list(self, limit: int, min_ms: float = 0.0) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        # Ids start with a UTC timestamp, so name order is time order.
+        names = sorted(
+            (n for n in os.listdir(self.directory) if n.endswith(".json")), reverse=True
+        )
+        out = []
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name)) as fh:
+                    summary = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            if summary["duration_ms"] < min_ms:
+                continue
+            summary.pop("sql", None)
+            out.append(summary)
+            if len(out) >= limit:
+                break
+        return out
+
+    def _prune(self) -> None:
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(".json"))
+        for name in names[: max(0, len(names) - self.keep)]:
+            stem = os.path.join(self.directory, name[: -len(".json")])
+            for suffix in (".json", ".prof"):
+                try:
+                    os.remove(stem + suffix)
+                except FileNotFoundError:
+                    pass
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        token: str = "",
+        sample_rate: float = 0.0,
+        slow_ms: float = 0.0,
+    ):
+        self.app = app
+        self.store = store
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    if secrets.compare_digest(value, self.token):
+                        return "header"
+                    break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = None
+        # Reading the profiles should not produce new ones.
+        if scope["type"] == "http" and not scope["path"].startswith("/debug/"):
+            trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(trigger)
+        token = _active_session.set(session)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active_session.reset(token)
+            duration_ms = (time.perf_counter() - started) * 1000
+            if trigger == "header" or duration_ms >= self.slow_ms:
+                route = scope.get("route")
+                summary = {
+                    "created_at": datetime.utcnow().isoformat(),
+                    "trigger": trigger,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route.path if route is not None else None,
+                    "status": status,
+                    "duration_ms": round(duration_ms, 3),
+                    "sql_statements": session.statement_count,
+                    "sql_ms": round(session.sql_seconds * 1000, 3),
+                }
+                await run_in_threadpool(self.store.save, session, summary)
@@ -1,19 +1,27 @@
 # discount_service/repositories.py
 from datetime import datetime, date
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 
 from . import models
 
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING / DO UPDATE ... RETURNING.
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
 
 class CampaignRepository:
     def __init__(self, db: Session):
         self.db = db
+        self.changes = CampaignChangeRepository(db)
 
     def create(self, campaign: models.Campaign) -> models.Campaign:
         self.db.add(campaign)
+        self.db.flush()
+        change = self.changes.record(campaign.id, models.CampaignChangeOp.CREATED)
+        campaign.version = change.version
         self.db.commit()
         self.db.refresh(campaign)
         return campaign
@@ -25,7 +33,16 @@ class CampaignRepository:
             .first()
         )
 
+    def get_version(self, campaign_id: int) -> Optional[int]:
+        """Current version without loading the campaign, or None if absent."""
+        return (
+            self.db.query(models.Campaign.version)
+            .filter(models.Campaign.id == campaign_id)
+            .scalar()
+        )
+
     def delete(self, campaign: models.Campaign):
+        self.changes.record(campaign.id, models.CampaignChangeOp.DELETED)
         self.db.delete(campaign)
         self.db.commit()
 
@@ -42,8 +59,11 @@ class CampaignRepository:
         return items, total_items
 
     def get_active_for_now(self, now: datetime) -> List[models.Campaign]:
+        # Targets are needed for every campaign; load them in one query
+        # instead of one lazy load each.
         return (
             self.db.query(models.Campaign)
+            .options(selectinload(models.Campaign.targets))
             .filter(
                 models.Campaign.is_active.is_(True),
                 models.Campaign.start_date <= now,
@@ -55,15 +75,131 @@ class CampaignRepository:
 
     def save(self, campaign: models.Campaign) -> models.Campaign:
         self.db.add(campaign)
+        # Callers replace targets through this too, so every write bumps it.
+        change = self.changes.record(campaign.id, models.CampaignChangeOp.UPDATED)
+        campaign.version = change.version
         self.db.commit()
         self.db.refresh(campaign)
         return campaign
 
+    def get_many(self, campaign_ids: List[int]) -> List[models.Campaign]:
+        if not campaign_ids:
+            return []
+        return (
+            self.db.query(models.Campaign)
+            .options(selectinload(models.Campaign.targets))
+            .filter(models.Campaign.id.in_(campaign_ids))
+            .all()
+        )
+
+    def get_live(self, now: datetime) -> List[models.Campaign]:
+        """Active campaigns that have not ended yet, including future ones."""
+        return (
+            self.db.query(models.Campaign)
+            .options(selectinload(models.Campaign.targets))
+            .filter(
+                models.Campaign.is_active.is_(True),
+                models.Campaign.end_date >= now,
+            )
+            .all()
+        )
+
+
+class CampaignChangeRepository:
+    COUNTER_NAME = "campaign_changes"
 
-class DiscountRepository:
     def __init__(self, db: Session):
         self.db = db
 
+    def _allocate_versions(self, count: int) -> int:
+        """Reserve `count` consecutive versions; returns the last one."""
+        # Increment in SQL so concurrent writers serialise on the counter row
+        # (row lock on Postgres, write lock on SQLite) instead of racing. An
+        # upsert also covers the very first write: two writers both finding
+        # no row would otherwise both INSERT it and one would fail.
+        table = models.VersionCounter.__table__
+        upsert = _UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+        if upsert is not None:
+            stmt = (
+                upsert(table)
+                .values(name=self.COUNTER_NAME, value=count)
+                .on_conflict_do_update(
+                    index_elements=[table.c.name], set_={"value": table.c.value + count}
+                )
+                .returning(table.c.value)
+            )
+            return int(self.db.execute(stmt).scalar_one())
+
+        result = self.db.execute(
+            update(models.VersionCounter)
+            .where(models.VersionCounter.name == self.COUNTER_NAME)
+            .values(value=models.VersionCounter.value + count)
+        )
+        if result.rowcount == 0:
+            self.db.add(models.VersionCounter(name=self.COUNTER_NAME, value=count))
+            self.db.flush()
+            return count
+        return int(
+            self.db.query(models.VersionCounter.value)
+            .filter(models.VersionCounter.name == self.COUNTER_NAME)
+            .scalar()
+        )
+
+    def record(
+        self, campaign_id: int, op: models.CampaignChangeOp
+    ) -> models.CampaignChange:
+        # No commit: the change is written in the caller's transaction.
+        change = models.CampaignChange(
+            version=self._allocate_versions(1),
+            campaign_id=campaign_id,
+            op=op,
+        )
+        self.db.add(change)
+        return change
+
+    def record_many(
+        self, campaign_ids: List[int], op: models.CampaignChangeOp
+    ) -> List[int]:
+        """
+        Bulk variant of record() for writes made with Core statements;
+        returns the versions, in campaign_ids order.
+        """
+        if not campaign_ids:
+            return []
+        first = self._allocate_versions(len(campaign_ids)) - len(campaign_ids) + 1
+        self.db.execute(
+            insert(models.CampaignChange),
+            [
+                {"version": first + i, "campaign_id": cid, "op": op}
+                for i, cid in enumerate(campaign_ids)
+            ],
+        )
+        return list(range(first, first + len(campaign_ids)))
+
+    def get_current_version(self) -> int:
+        value = (
+            self.db.query(models.VersionCounter.value)
+            .filter(models.VersionCounter.name == self.COUNTER_NAME)
+            .scalar()
+        )
+        return int(value or 0)
+
+    def list_since(self, version: int, limit: int) -> List[models.CampaignChange]:
+        return (
+            self.db.query(models.CampaignChange)
+            .filter(models.CampaignChange.version > version)
+            .order_by(models.CampaignChange.version.asc())
+            .limit(limit)
+            .all()
+        )
+
+
+class DiscountRepository:
+    def __init__(self, db: Session, clock: Optional[Callable[[], datetime]] = None):
+        self.db = db
+        # Replays (the what-if simulator) run on a simulated clock.
+        self.clock = clock
+
     def get_total_discount_for_campaign(self, campaign_id: int) -> float:
         total = (
             self.db.query(func.coalesce(func.sum(models.DiscountRedemption.discount_amount), 0.0))
@@ -75,7 +211,7 @@ class DiscountRepository:
     def get_usage_count_for_customer_today(
         self, campaign_id: int, customer_id: str
     ) -> int:
-        today = date.today()
+        today = self.clock().date() if self.clock is not None else date.today()
         start = datetime.combine(today, datetime.min.time())
         end = datetime.combine(today, datetime.max.time())
 
@@ -99,6 +235,22 @@ class DiscountRepository:
         )
         return int(count or 0)
 
+    def get_totals_by_campaign(self, campaign_ids: List[int]) -> Dict[int, Tuple[float, int]]:
+        """campaign_id -> (total discount, redemptions), one grouped query."""
+        if not campaign_ids:
+            return {}
+        rows = (
+            self.db.query(
+                models.DiscountRedemption.campaign_id,
+                func.sum(models.DiscountRedemption.discount_amount),
+                func.count(models.DiscountRedemption.id),
+            )
+            .filter(models.DiscountRedemption.campaign_id.in_(campaign_ids))
+            .group_by(models.DiscountRedemption.campaign_id)
+            .all()
+        )
+        return {cid: (float(total or 0.0), int(count)) for cid, total, count in rows}
+
     def create_redemption(
         self,
         campaign_id: int,
@@ -112,7 +264,234 @@ class DiscountRepository:
             discount_amount=discount_amount,
             order_id=order_id,
         )
+        if self.clock is not None:
+            redemption.created_at = self.clock()
         self.db.add(redemption)
         self.db.commit()
         self.db.refresh(redemption)
         return redemption
+
+
+class BudgetLeaseRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def lock_campaign(self, campaign_id: int) -> Optional[models.Campaign]:
+        # FOR UPDATE serialises lease grants on Postgres; SQLite ignores it and
+        # relies on its single-writer lock instead.
+        return (
+            self.db.query(models.Campaign)
+            .filter(models.Campaign.id == campaign_id)
+            .with_for_update()
+            .first()
+        )
+
+    def get_for_worker(
+        self, campaign_id: int, worker_id: str
+    ) -> Optional[models.CampaignBudgetLease]:
+        return (
+            self.db.query(models.CampaignBudgetLease)
+            .filter(
+                models.CampaignBudgetLease.campaign_id == campaign_id,
+                models.CampaignBudgetLease.worker_id == worker_id,
+            )
+            .first()
+        )
+
+    def get_grant_totals(
+        self, campaign_id: int, worker_id: str, now: datetime
+    ) -> Tuple[float, int, float, int]:
+        """
+        (discount spent, redemptions, budget and uses leased to other live
+        workers) for a campaign, read in a single statement.
+        """
+        R, L = models.DiscountRedemption, models.CampaignBudgetLease
+        live_others = (
+            L.campaign_id == campaign_id,
+            L.worker_id != worker_id,
+            L.expires_at > now,
+        )
+        spent, used, budget, uses = self.db.execute(
+            select(
+                select(func.coalesce(func.sum(R.discount_amount), 0.0))
+                .where(R.campaign_id == campaign_id)
+                .scalar_subquery(),
+                select(func.count(R.id)).where(R.campaign_id == campaign_id).scalar_subquery(),
+                select(func.coalesce(func.sum(L.remaining_budget), 0.0))
+                .where(*live_others)
+                .scalar_subquery(),
+                select(func.coalesce(func.sum(L.remaining_uses), 0))
+                .where(*live_others)
+                .scalar_subquery(),
+            )
+        ).one()
+        return float(spent or 0.0), int(used or 0), float(budget or 0.0), int(uses or 0)
+
+    def consume(self, campaign_id: int, worker_id: str, amount: float) -> None:
+        # No commit: runs inside the caller's redemption transaction.
+        self.db.execute(
+            update(models.CampaignBudgetLease)
+            .where(
+                models.CampaignBudgetLease.campaign_id == campaign_id,
+                models.CampaignBudgetLease.worker_id == worker_id,
+            )
+            .values(
+                remaining_budget=models.CampaignBudgetLease.remaining_budget - amount,
+                remaining_uses=models.CampaignBudgetLease.remaining_uses - 1,
+            )
+        )
+
+    def list_for_worker(self, worker_id: str) -> List[models.CampaignBudgetLease]:
+        return (
+            self.db.query(models.CampaignBudgetLease)
+            .filter(models.CampaignBudgetLease.worker_id == worker_id)
+            .all()
+        )
+
+
+class RollupRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def lock_watermark(self, name: str) -> models.RollupWatermark:
+        # FOR UPDATE locks nothing while the row is missing, so two compactors
+        # starting together would both insert it; create it idempotently first.
+        table = models.RollupWatermark.__table__
+        upsert = _UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+        if upsert is not None:
+            self.db.execute(
+                upsert(table)
+                .values(name=name, last_redemption_id=0, updated_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=[table.c.name])
+            )
+        watermark = (
+            self.db.query(models.RollupWatermark)
+            .filter(models.RollupWatermark.name == name)
+            .with_for_update()
+            .first()
+        )
+        if watermark is None:
+            watermark = models.RollupWatermark(name=name, last_redemption_id=0)
+            self.db.add(watermark)
+        # Flushing a write takes SQLite's write lock, so two compactors
+        # cannot fold the same rows twice.
+        watermark.updated_at = datetime.utcnow()
+        self.db.flush()
+        return watermark
+
+    def get_watermark(self, name: str) -> int:
+        last_id = (
+            self.db.query(models.RollupWatermark.last_redemption_id)
+            .filter(models.RollupWatermark.name == name)
+            .scalar()
+        )
+        return int(last_id or 0)
+
+    def get_max_redemption_id(self) -> int:
+        max_id = self.db.query(func.max(models.DiscountRedemption.id)).scalar()
+        return int(max_id or 0)
+
+    def fetch_redemptions_after(self, last_id: int, limit: int) -> list:
+        return (
+            self.db.query(
+                models.DiscountRedemption.id,
+                models.DiscountRedemption.campaign_id,
+                models.DiscountRedemption.customer_id,
+                models.DiscountRedemption.discount_amount,
+                models.DiscountRedemption.created_at,
+            )
+            .filter(models.DiscountRedemption.id > last_id)
+            .order_by(models.DiscountRedemption.id.asc())
+            .limit(limit)
+            .all()
+        )
+
+    def get_daily_stats_rows(
+        self, campaign_ids: List[int], days: List[date]
+    ) -> List[models.CampaignDailyStats]:
+        return (
+            self.db.query(models.CampaignDailyStats)
+            .filter(
+                models.CampaignDailyStats.campaign_id.in_(campaign_ids),
+                models.CampaignDailyStats.day.in_(days),
+            )
+            .all()
+        )
+
+    def get_daily_customer_keys(
+        self, campaign_ids: List[int], days: List[date], customer_ids: List[str]
+    ) -> set:
+        rows = (
+            self.db.query(
+                models.CampaignDailyCustomer.campaign_id,
+                models.CampaignDailyCustomer.day,
+                models.CampaignDailyCustomer.customer_id,
+            )
+            .filter(
+                models.CampaignDailyCustomer.campaign_id.in_(campaign_ids),
+                models.CampaignDailyCustomer.day.in_(days),
+                models.CampaignDailyCustomer.customer_id.in_(customer_ids),
+            )
+            .all()
+        )
+        return {(r[0], r[1], r[2]) for r in rows}
+
+    def _date_filters(self, column, start: Optional[date], end: Optional[date]):
+        filters = []
+        if start is not None:
+            filters.append(column >= start)
+        if end is not None:
+            filters.append(column <= end)
+        return filters
+
+    def list_daily_for_campaign(
+        self, campaign_id: int, start: Optional[date] = None, end: Optional[date] = None
+    ) -> List[models.CampaignDailyStats]:
+        return (
+            self.db.query(models.CampaignDailyStats)
+            .filter(
+                models.CampaignDailyStats.campaign_id == campaign_id,
+                *self._date_filters(models.CampaignDailyStats.day, start, end),
+            )
+            .order_by(models.CampaignDailyStats.day.asc())
+            .all()
+        )
+
+    def get_totals_for_campaigns(
+        self,
+        campaign_ids: List[int],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> dict:
+        """Returns {campaign_id: (redemptions, total_discount, unique_customers)}."""
+        if not campaign_ids:
+            return {}
+        sums = (
+            self.db.query(
+                models.CampaignDailyStats.campaign_id,
+                func.sum(models.CampaignDailyStats.redemptions),
+                func.sum(models.CampaignDailyStats.total_discount),
+            )
+            .filter(
+                models.CampaignDailyStats.campaign_id.in_(campaign_ids),
+                *self._date_filters(models.CampaignDailyStats.day, start, end),
+            )
+            .group_by(models.CampaignDailyStats.campaign_id)
+            .all()
+        )
+        uniques = dict(
+            self.db.query(
+                models.CampaignDailyCustomer.campaign_id,
+                func.count(func.distinct(models.CampaignDailyCustomer.customer_id)),
+            )
+            .filter(
+                models.CampaignDailyCustomer.campaign_id.in_(campaign_ids),
+                *self._date_filters(models.CampaignDailyCustomer.day, start, end),
+            )
+            .group_by(models.CampaignDailyCustomer.campaign_id)
+            .all()
+        )
+        return {
+            cid: (int(count or 0), float(spend or 0.0), int(uniques.get(cid, 0)))
+            for cid, count, spend in sums
+        }
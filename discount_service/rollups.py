@@ -0,0 +1,138 @@
+# discount_service/rollups.py
+"""
+Incremental per-campaign per-day rollups of discount_redemptions.
+
+Only redemptions above the stored watermark are read, so each run costs
+O(new rows) no matter how large the redemption table gets. Run it from cron
+or a sidecar with:
+
+    python -m discount_service.rollups
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .repositories import RollupRepository
+
+REDEMPTIONS_WATERMARK = "discount_redemptions"
+
+
+class RollupCompactor:
+    def __init__(self, batch_size: int = 5000, settle_seconds: float = 5.0):
+        self.batch_size = batch_size
+        # Where ids can commit out of order (Postgres sequences), only fold
+        # rows older than this so a late commit is not skipped for good;
+        # 0 is only safe where ids commit in order (SQLite).
+        self.settle = timedelta(seconds=settle_seconds)
+
+    def compact(self, db: Session, max_rows: Optional[int] = None) -> int:
+        """Fold new redemptions into the rollups; returns rows processed."""
+        repo = RollupRepository(db)
+        if repo.get_max_redemption_id() <= repo.get_watermark(REDEMPTIONS_WATERMARK):
+            return 0
+
+        processed = 0
+        while max_rows is None or processed < max_rows:
+            limit = self.batch_size
+            if max_rows is not None:
+                limit = min(limit, max_rows - processed)
+            count = self._compact_batch(db, limit)
+            processed += count
+            if count < limit:
+                break
+        return processed
+
+    def _compact_batch(self, db: Session, limit: int) -> int:
+        repo = RollupRepository(db)
+        try:
+            watermark = repo.lock_watermark(REDEMPTIONS_WATERMARK)
+            rows = repo.fetch_redemptions_after(watermark.last_redemption_id, limit)
+            if self.settle:
+                cutoff = datetime.utcnow() - self.settle
+                settled = 0
+                for row in rows:
+                    if row.created_at > cutoff:
+                        break
+                    settled += 1
+                rows = rows[:settled]
+            if not rows:
+                db.rollback()
+                return 0
+
+            per_day = defaultdict(lambda: [0, 0.0])
+            seen = set()
+            for row in rows:
+                key = (row.campaign_id, row.created_at.date())
+                per_day[key][0] += 1
+                per_day[key][1] += row.discount_amount
+                seen.add((row.campaign_id, key[1], row.customer_id))
+
+            campaign_ids = sorted({k[0] for k in per_day})
+            days = sorted({k[1] for k in per_day})
+            customer_ids = sorted({k[2] for k in seen})
+
+            new_customers = seen - repo.get_daily_customer_keys(
+                campaign_ids, days, customer_ids
+            )
+            unique_delta = defaultdict(int)
+            for campaign_id, day, _ in new_customers:
+                unique_delta[(campaign_id, day)] += 1
+            if new_customers:
+                db.execute(
+                    insert(models.CampaignDailyCustomer),
+                    [
+                        {"campaign_id": c, "day": d, "customer_id": cust}
+                        for c, d, cust in sorted(new_customers)
+                    ],
+                )
+
+            existing = {
+                (s.campaign_id, s.day): s
+                for s in repo.get_daily_stats_rows(campaign_ids, days)
+            }
+            for key, (count, spend) in per_day.items():
+                stats = existing.get(key)
+                if stats is None:
+                    stats = models.CampaignDailyStats(
+                        campaign_id=key[0],
+                        day=key[1],
+                        redemptions=0,
+                        total_discount=0.0,
+                        unique_customers=0,
+                    )
+                    db.add(stats)
+                stats.redemptions += count
+                stats.total_discount += spend
+                stats.unique_customers += unique_delta.get(key, 0)
+
+            watermark.last_redemption_id = rows[-1].id
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+
+
+def main():
+    from .config import settings
+    from .database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    compactor = RollupCompactor(
+        batch_size=settings.rollup_batch_size,
+        settle_seconds=settings.rollup_settle_seconds,
+    )
+    db = SessionLocal()
+    try:
+        processed = compactor.compact(db)
+        print(f"Folded {processed} redemptions into daily rollups.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
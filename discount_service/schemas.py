@@ -1,10 +1,10 @@
 # discount_service/schemas.py
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 
 from pydantic import BaseModel, Field, validator
 
-from .models import DiscountScope, DiscountValueType
+from .models import CampaignChangeOp, DiscountScope, DiscountValueType
 
 
 class CampaignBase(BaseModel):
@@ -68,7 +68,9 @@ class CampaignUpdate(CampaignBase):
     is_active: bool = True
 
 
-class CampaignOut(BaseModel):
+class CampaignCodeOut(BaseModel):
+    """A campaign as shown to whoever holds its code: no targeting list."""
+
     id: int
     name: str
     description: Optional[str]
@@ -91,13 +93,16 @@ class CampaignOut(BaseModel):
     allow_stack_with_other_discounts: bool
     priority: int
     is_active: bool
-
-    target_customer_ids: List[str] = []
+    version: int = 0
 
     class Config:
         orm_mode = True
 
 
+class CampaignOut(CampaignCodeOut):
+    target_customer_ids: List[str] = []
+
+
 class CampaignPage(BaseModel):
     items: List[CampaignOut]
     page: int
@@ -117,6 +122,9 @@ class AvailableCampaign(BaseModel):
     applicable_discount: float
     final_cart_total: float
     final_delivery_charge: float
+    # True when computed under overload without usage limits or spent budget;
+    # /discounts/apply may still refuse it.
+    provisional: bool = False
 
 
 class DiscountApplyRequest(DiscountCheckRequest):
@@ -124,9 +132,75 @@ class DiscountApplyRequest(DiscountCheckRequest):
     order_id: Optional[str] = None
 
 
+class DiscountApplyByCodeRequest(DiscountCheckRequest):
+    code: str = Field(..., min_length=1, max_length=50)
+    order_id: Optional[str] = None
+
+
 class DiscountApplyResponse(BaseModel):
     campaign_id: int
     customer_id: str
     applied_discount: float
     final_cart_total: float
     final_delivery_charge: float
+
+
+class CampaignDailyStatsOut(BaseModel):
+    day: date
+    redemptions: int
+    total_discount: float
+    unique_customers: int
+
+
+class CampaignStatsOut(BaseModel):
+    campaign_id: int
+    name: str
+    total_budget: float
+    redemptions: int
+    total_discount: float
+    unique_customers: int
+
+
+class CampaignStatsDetail(CampaignStatsOut):
+    days: List[CampaignDailyStatsOut] = []
+    as_of_redemption_id: int
+
+
+class CampaignStatsPage(BaseModel):
+    items: List[CampaignStatsOut]
+    page: int
+    page_size: int
+    total_items: int
+    total_pages: int
+    as_of_redemption_id: int
+
+
+class CampaignChangeOut(BaseModel):
+    version: int
+    campaign_id: int
+    op: CampaignChangeOp
+    # Current state of the campaign; None when it has been deleted.
+    campaign: Optional[CampaignOut] = None
+
+
+class CampaignChangesPage(BaseModel):
+    changes: List[CampaignChangeOut]
+    # Pass as `since` on the next call.
+    last_version: int
+    has_more: bool
+
+
+class RequestProfileOut(BaseModel):
+    id: str
+    created_at: datetime
+    # "header" (X-Profile-Token) or "sample".
+    trigger: str
+    method: str
+    path: str
+    route: Optional[str] = None
+    status: int
+    duration_ms: float
+    sql_statements: int
+    sql_ms: float
+    # pstats file; the .json next to it also holds the captured SQL.
+    profile_file: str
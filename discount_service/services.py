@@ -1,10 +1,16 @@
 # discount_service/services.py
+import time
 from datetime import datetime
-from typing import List
+from typing import Callable, List, Optional
 
 from . import models, schemas
+from .admission import DeadlineExceeded
 from .repositories import CampaignRepository, DiscountRepository
 from .discount_strategies import DiscountStrategyFactory
+from .budget_leasing import BudgetLeaseManager
+from .eligibility import CampaignRuleCache, evaluate, normalize_code
+from .metrics import NULL_STAGES, Metrics
+from .profiling import profiled
 
 
 class DiscountService:
@@ -12,16 +18,27 @@ class DiscountService:
         self,
         campaign_repo: CampaignRepository,
         discount_repo: DiscountRepository,
+        budget_leases: Optional[BudgetLeaseManager] = None,
+        rule_cache: Optional[CampaignRuleCache] = None,
+        metrics: Optional[Metrics] = None,
+        clock: Callable[[], datetime] = datetime.utcnow,
     ):
         self.campaign_repo = campaign_repo
         self.discount_repo = discount_repo
+        self.budget_leases = budget_leases
+        self.rule_cache = rule_cache
+        self.metrics = metrics
+        self.clock = clock
+
+    def _stages(self, operation: str):
+        return self.metrics.stages(operation) if self.metrics is not None else NULL_STAGES
 
     def _is_customer_targeted(self, campaign: models.Campaign, customer_id: str) -> bool:
         if not campaign.targets:
             return True
         return any(t.customer_id == customer_id for t in campaign.targets)
 
-    def _passes_usage_limits(
+    def _passes_daily_limit(
         self,
         campaign: models.Campaign,
         customer_id: str,
@@ -29,7 +46,14 @@ class DiscountService:
         usage_today = self.discount_repo.get_usage_count_for_customer_today(
             campaign.id, customer_id
         )
-        if usage_today >= campaign.max_transactions_per_customer_per_day:
+        return usage_today < campaign.max_transactions_per_customer_per_day
+
+    def _passes_usage_limits(
+        self,
+        campaign: models.Campaign,
+        customer_id: str,
+    ) -> bool:
+        if not self._passes_daily_limit(campaign, customer_id):
             return False
 
         if campaign.max_uses_overall is not None:
@@ -59,9 +83,11 @@ class DiscountService:
         campaign: models.Campaign,
         cart_total: float,
         delivery_charge: float,
+        remaining_budget: Optional[float] = None,
     ) -> float:
-        spent = self.discount_repo.get_total_discount_for_campaign(campaign.id)
-        remaining_budget = campaign.total_budget - spent
+        if remaining_budget is None:
+            spent = self.discount_repo.get_total_discount_for_campaign(campaign.id)
+            remaining_budget = campaign.total_budget - spent
         if remaining_budget <= 0:
             return 0.0
 
@@ -78,7 +104,24 @@ class DiscountService:
             remaining_budget=remaining_budget,
         )
 
-    def _to_campaign_out(self, camp: models.Campaign) -> schemas.CampaignOut:
+    def _static_discount(
+        self,
+        campaign: models.Campaign,
+        customer_id: str,
+        cart_total: float,
+        delivery_charge: float,
+    ) -> float:
+        """evaluate() on an uncompiled campaign: no DB checks, 0.0 on failure."""
+        if not self._is_customer_targeted(campaign, customer_id):
+            return 0.0
+        if not self._passes_minimums(campaign, cart_total, delivery_charge):
+            return 0.0
+        return self._compute_discount(
+            campaign, cart_total, delivery_charge, remaining_budget=campaign.total_budget
+        )
+
+    @staticmethod
+    def _to_campaign_out(camp: models.Campaign) -> schemas.CampaignOut:
         return schemas.CampaignOut(
             id=camp.id,
             name=camp.name,
@@ -99,54 +142,143 @@ class DiscountService:
             priority=camp.priority,
             is_active=camp.is_active,
             target_customer_ids=[t.customer_id for t in camp.targets],
+            version=camp.version,
         )
 
+    @profiled
     def get_available_campaigns(
-        self, req: schemas.DiscountCheckRequest
+        self, req: schemas.DiscountCheckRequest, provisional: bool = False
     ) -> List[schemas.AvailableCampaign]:
-        now = datetime.utcnow()
-        campaigns = self.campaign_repo.get_active_for_now(now)
+        """
+        Campaigns this cart qualifies for, best priority first. With
+        `provisional` only the static rules are checked (no usage-limit or
+        spent-budget queries), for answering cheaply under overload.
+        """
+        stages = self._stages("available")
+        clock = stages.clock
+        started = clock()
+        now = self.clock()
+        if self.rule_cache is not None:
+            self.rule_cache.sync(self.campaign_repo.db)
+            entries = self.rule_cache.active(now)
+        else:
+            # Compiling costs more than one evaluation, so without a cache
+            # to keep the rules the ORM rows are evaluated directly.
+            entries = [
+                (camp, camp) for camp in self.campaign_repo.get_active_for_now(now)
+            ]
+        loaded = clock()
+        stages.add("load_campaigns", loaded - started)
+        usage_seconds = budget_seconds = render_seconds = 0.0
 
         result: List[schemas.AvailableCampaign] = []
 
-        for camp in campaigns:
-            if not self._is_customer_targeted(camp, req.customer_id):
-                continue
+        customer_id = req.customer_id
+        cart_total = req.cart_total
+        delivery_charge = req.delivery_charge
 
-            if not self._passes_usage_limits(camp, req.customer_id):
+        for rule, camp in entries:
+            # Static rules first: they are free, the checks below hit the DB.
+            if rule is camp:
+                discount = self._static_discount(
+                    camp, customer_id, cart_total, delivery_charge
+                )
+                is_cart = camp.discount_scope == models.DiscountScope.CART
+            else:
+                discount = evaluate(rule, customer_id, cart_total, delivery_charge)
+                is_cart = rule.is_cart
+            if discount <= 0:
                 continue
 
-            if not self._passes_minimums(camp, req.cart_total, req.delivery_charge):
-                continue
+            if not provisional:
+                t = clock()
+                passes = self._passes_usage_limits(rule, customer_id)
+                usage_seconds += clock() - t
+                if not passes:
+                    continue
 
-            discount = self._compute_discount(camp, req.cart_total, req.delivery_charge)
-            if discount <= 0:
-                continue
+                t = clock()
+                spent = self.discount_repo.get_total_discount_for_campaign(rule.id)
+                budget_seconds += clock() - t
+                discount = min(discount, rule.total_budget - spent)
+                if discount <= 0:
+                    continue
+            else:
+                discount = min(discount, rule.total_budget)
 
-            final_cart_total = req.cart_total
-            final_delivery_charge = req.delivery_charge
+            final_cart_total = cart_total
+            final_delivery_charge = delivery_charge
 
-            if camp.discount_scope == models.DiscountScope.CART:
-                final_cart_total = max(req.cart_total - discount, 0.0)
+            if is_cart:
+                final_cart_total = max(cart_total - discount, 0.0)
             else:
-                final_delivery_charge = max(req.delivery_charge - discount, 0.0)
+                final_delivery_charge = max(delivery_charge - discount, 0.0)
 
+            t = clock()
             result.append(
                 schemas.AvailableCampaign(
-                    campaign=self._to_campaign_out(camp),
+                    campaign=(
+                        camp
+                        if isinstance(camp, schemas.CampaignOut)
+                        else self._to_campaign_out(camp)
+                    ),
                     applicable_discount=discount,
                     final_cart_total=final_cart_total,
                     final_delivery_charge=final_delivery_charge,
+                    provisional=provisional,
                 )
             )
+            render_seconds += clock() - t
 
+        # Whatever the loop spent outside the DB checks and rendering.
+        stages.add(
+            "evaluate",
+            clock() - loaded - usage_seconds - budget_seconds - render_seconds,
+        )
+        stages.add("usage_limits", usage_seconds)
+        stages.add("budget", budget_seconds)
+        stages.add("render", render_seconds)
+        stages.finish(evaluated=len(entries), returned=len(result))
         return result
 
-    def apply_discount(self, req: schemas.DiscountApplyRequest) -> schemas.DiscountApplyResponse:
-        now = datetime.utcnow()
+    def resolve_code(self, code: str) -> Optional[int]:
+        """Id of the running campaign with this coupon code (needs rule_cache)."""
+        entry = self.rule_cache.find_code(self.campaign_repo.db, code, self.clock())
+        return entry[0].id if entry is not None else None
+
+    def get_campaign_by_code(self, code: str) -> Optional[schemas.CampaignCodeOut]:
+        entry = self.rule_cache.find_code(self.campaign_repo.db, code, self.clock())
+        if entry is None:
+            return None
+        # Anyone may look a code up; the targeted customer ids stay private.
+        return schemas.CampaignCodeOut(
+            **entry[1].model_dump(exclude={"target_customer_ids"})
+        )
+
+    @profiled
+    def apply_discount(
+        self,
+        req: schemas.DiscountApplyRequest,
+        code: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> schemas.DiscountApplyResponse:
+        """
+        Redeem the campaign for this cart. `code` is the coupon code the
+        campaign was resolved from; it is re-checked against the loaded row
+        in case the code moved since the index was synced. Past `deadline`
+        (a time.monotonic() value) nothing is written and DeadlineExceeded
+        is raised.
+        """
+        stages = self._stages("apply")
+        clock = stages.clock
+        t = clock()
+        now = self.clock()
         campaign = self.campaign_repo.get(req.campaign_id)
+        stages.add("load_campaign", clock() - t)
         if not campaign or not campaign.is_active:
             raise ValueError("Campaign not found or inactive")
+        if code is not None and normalize_code(campaign.code or "") != normalize_code(code):
+            raise ValueError("Campaign not found or inactive")
 
         if not (campaign.start_date <= now <= campaign.end_date):
             raise ValueError("Campaign not active in current date range")
@@ -154,17 +286,40 @@ class DiscountService:
         if not self._is_customer_targeted(campaign, req.customer_id):
             raise ValueError("Customer not eligible for this campaign")
 
-        if not self._passes_usage_limits(campaign, req.customer_id):
+        # With budget leasing the overall caps are enforced by the leased
+        # slice, so only the per-customer daily limit needs the DB here.
+        t = clock()
+        if self.budget_leases is not None:
+            passes = self._passes_daily_limit(campaign, req.customer_id)
+        else:
+            passes = self._passes_usage_limits(campaign, req.customer_id)
+        stages.add("usage_limits", clock() - t)
+        if not passes:
             raise ValueError("Usage limit exceeded for this campaign")
 
         if not self._passes_minimums(campaign, req.cart_total, req.delivery_charge):
             raise ValueError("Order does not meet minimum requirements")
 
-        discount = self._compute_discount(
-            campaign, req.cart_total, req.delivery_charge
-        )
-        if discount <= 0:
-            raise ValueError("No discount applicable")
+        t = clock()
+        if self.budget_leases is not None:
+            discount = self._compute_discount(
+                campaign,
+                req.cart_total,
+                req.delivery_charge,
+                remaining_budget=campaign.total_budget,
+            )
+            if discount <= 0:
+                raise ValueError("No discount applicable")
+            discount = self.budget_leases.reserve(
+                self.discount_repo.db, campaign.id, discount
+            )
+        else:
+            discount = self._compute_discount(
+                campaign, req.cart_total, req.delivery_charge
+            )
+            if discount <= 0:
+                raise ValueError("No discount applicable")
+        stages.add("budget", clock() - t)
 
         final_cart_total = req.cart_total
         final_delivery_charge = req.delivery_charge
@@ -173,12 +328,36 @@ class DiscountService:
         else:
             final_delivery_charge = max(req.delivery_charge - discount, 0.0)
 
-        self.discount_repo.create_redemption(
-            campaign_id=campaign.id,
-            customer_id=req.customer_id,
-            discount_amount=discount,
-            order_id=req.order_id,
-        )
+        # Last point before the redemption is written: nobody is waiting for
+        # a result past the client's deadline, so don't spend the budget.
+        if deadline is not None and time.monotonic() >= deadline:
+            if self.budget_leases is not None:
+                self.budget_leases.release(req.campaign_id, discount)
+            raise DeadlineExceeded()
+
+        t = clock()
+        try:
+            if self.budget_leases is not None:
+                self.budget_leases.record_use(
+                    self.discount_repo.db, campaign.id, discount
+                )
+            self.discount_repo.create_redemption(
+                campaign_id=campaign.id,
+                customer_id=req.customer_id,
+                discount_amount=discount,
+                order_id=req.order_id,
+            )
+        except Exception:
+            if self.budget_leases is not None:
+                # Undo the lease-row consume first, so the local slice is
+                # only restored once the DB agrees it was not used.
+                self.discount_repo.db.rollback()
+                self.budget_leases.release(req.campaign_id, discount)
+            raise
+        if self.budget_leases is not None:
+            self.budget_leases.confirm(campaign.id, discount)
+        stages.add("redeem", clock() - t)
+        stages.finish()
 
         return schemas.DiscountApplyResponse(
             campaign_id=campaign.id,
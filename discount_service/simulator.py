@@ -0,0 +1,422 @@
+# discount_service/simulator.py
+"""
+Offline what-if simulation of proposed campaigns.
+
+Historical checkouts are replayed in time order against a set of proposed
+CampaignCreate definitions, by default next to a snapshot of the live
+campaigns (with their remaining budget and uses). Every checkout goes
+through the real DiscountService: get_available_campaigns, then
+apply_discount for the offer the customer takes. That runs against a
+private in-memory SQLite database and a simulated clock, so date ranges,
+daily limits and budgets behave as they would have; the live database is
+only read.
+
+A replay is sequential (every redemption changes the remaining budgets),
+so the process pool runs scenarios side by side: the live campaigns alone
+(baseline), all proposals together, and each proposal on its own. Comparing
+a live campaign's redemptions across scenarios shows what a proposal takes
+from it.
+
+    python -m discount_service.simulator proposals.json --checkouts checkouts.jsonl
+    python -m discount_service.simulator proposals.json --since 2026-09-01
+
+proposals.json is a list of CampaignCreate objects. A checkouts.jsonl line
+is {"at": "...", "customer_id": "...", "cart_total": 0.0,
+"delivery_charge": 0.0}. Without --checkouts, past redemptions stand in
+for checkouts; they do not store cart totals, so --cart-total and
+--delivery-charge are used for all of them.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from . import models, schemas
+from .database import Base, Database
+from .eligibility import CampaignRuleCache
+from .repositories import CampaignRepository, DiscountRepository
+from .services import DiscountService
+
+# Campaign columns copied from the live snapshot into a simulation.
+_CAMPAIGN_FIELDS = (
+    "name",
+    "description",
+    "discount_scope",
+    "discount_value_type",
+    "discount_value",
+    "max_discount_amount",
+    "start_date",
+    "end_date",
+    "total_budget",
+    "min_cart_total",
+    "min_delivery_charge",
+    "max_transactions_per_customer_per_day",
+    "max_uses_overall",
+    "allow_stack_with_other_discounts",
+    "priority",
+    "is_active",
+)
+
+
+class Checkout(NamedTuple):
+    at: datetime
+    customer_id: str
+    cart_total: float
+    delivery_charge: float
+
+
+@dataclass
+class Scenario:
+    name: str
+    # CampaignCreate objects as dicts (they cross process boundaries).
+    proposals: List[dict]
+    include_existing: bool = True
+
+
+@dataclass
+class CampaignProjection:
+    name: str
+    proposed: bool
+    # For live campaigns: what is left of the budget / uses at snapshot time.
+    total_budget: float
+    max_uses_overall: Optional[int]
+    offered: int = 0
+    redemptions: int = 0
+    spend: float = 0.0
+    exhausted_at: Optional[datetime] = None
+    hours_to_exhaustion: Optional[float] = None
+    spend_per_day: float = 0.0
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    checkouts: int
+    discounted_checkouts: int
+    replay_start: Optional[datetime]
+    replay_end: Optional[datetime]
+    campaigns: List[CampaignProjection] = field(default_factory=list)
+
+
+class SimulatedClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def load_checkouts_jsonl(path: str) -> List[Checkout]:
+    checkouts = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            checkouts.append(
+                Checkout(
+                    at=datetime.fromisoformat(record["at"]),
+                    customer_id=str(record["customer_id"]),
+                    cart_total=float(record["cart_total"]),
+                    delivery_charge=float(record["delivery_charge"]),
+                )
+            )
+    return sorted(checkouts)
+
+
+def load_checkouts_from_redemptions(
+    db: Session,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    cart_total: float,
+    delivery_charge: float,
+) -> List[Checkout]:
+    query = db.query(
+        models.DiscountRedemption.created_at, models.DiscountRedemption.customer_id
+    )
+    if since is not None:
+        query = query.filter(models.DiscountRedemption.created_at >= since)
+    if until is not None:
+        query = query.filter(models.DiscountRedemption.created_at < until)
+    query = query.order_by(models.DiscountRedemption.created_at)
+    return [
+        Checkout(at, customer_id, cart_total, delivery_charge)
+        for at, customer_id in query.yield_per(10_000)
+    ]
+
+
+def snapshot_live_campaigns(db: Session, now: datetime) -> List[dict]:
+    """Live campaigns with the budget and uses they have left."""
+    campaigns = CampaignRepository(db).get_live(now)
+    totals = DiscountRepository(db).get_totals_by_campaign([c.id for c in campaigns])
+    rows = []
+    for camp in campaigns:
+        spent, uses = totals.get(camp.id, (0.0, 0))
+        row = {name: getattr(camp, name) for name in _CAMPAIGN_FIELDS}
+        row["total_budget"] = max(camp.total_budget - spent, 0.0)
+        if camp.max_uses_overall is not None:
+            row["max_uses_overall"] = max(camp.max_uses_overall - uses, 0)
+        row["target_customer_ids"] = [t.customer_id for t in camp.targets]
+        rows.append(row)
+    return rows
+
+
+def _campaign_model(fields: dict) -> models.Campaign:
+    fields = dict(fields)
+    targets = fields.pop("target_customer_ids", None) or []
+    # Codes play no part in eligibility and may clash between live and proposed.
+    fields.pop("code", None)
+    fields.setdefault("is_active", True)
+    campaign = models.Campaign(**{k: v for k, v in fields.items() if k in _CAMPAIGN_FIELDS})
+    campaign.targets = [models.CampaignTargetCustomer(customer_id=c) for c in targets]
+    return campaign
+
+
+def simulate(
+    scenario: Scenario,
+    checkouts: List[Checkout],
+    existing: List[dict],
+    choice: str = "priority",
+) -> ScenarioResult:
+    """Replay `checkouts` through DiscountService on a private in-memory DB."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    clock = SimulatedClock(checkouts[0].at if checkouts else datetime.utcnow())
+    campaign_repo = CampaignRepository(db)
+    service = DiscountService(
+        campaign_repo,
+        DiscountRepository(db, clock=clock),
+        rule_cache=CampaignRuleCache(render=DiscountService._to_campaign_out, clock=clock),
+        clock=clock,
+    )
+
+    projections: Dict[int, CampaignProjection] = {}
+    starts: Dict[int, datetime] = {}
+    definitions = [(row, False) for row in (existing if scenario.include_existing else [])]
+    definitions += [(row, True) for row in scenario.proposals]
+    for row, proposed in definitions:
+        campaign = campaign_repo.create(_campaign_model(row))
+        starts[campaign.id] = campaign.start_date
+        projections[campaign.id] = CampaignProjection(
+            name=campaign.name,
+            proposed=proposed,
+            total_budget=campaign.total_budget,
+            max_uses_overall=campaign.max_uses_overall,
+        )
+
+    discounted = 0
+    for n, checkout in enumerate(checkouts):
+        clock.now = checkout.at
+        offers = service.get_available_campaigns(
+            schemas.DiscountCheckRequest(
+                customer_id=checkout.customer_id,
+                cart_total=checkout.cart_total,
+                delivery_charge=checkout.delivery_charge,
+            )
+        )
+        if not offers:
+            continue
+        for offer in offers:
+            projections[offer.campaign.id].offered += 1
+        if choice == "best":
+            taken = max(offers, key=lambda offer: offer.applicable_discount)
+        else:
+            # Offers come highest priority first, as the checkout shows them.
+            taken = offers[0]
+        try:
+            applied = service.apply_discount(
+                schemas.DiscountApplyRequest(
+                    campaign_id=taken.campaign.id,
+                    customer_id=checkout.customer_id,
+                    cart_total=checkout.cart_total,
+                    delivery_charge=checkout.delivery_charge,
+                    order_id=f"sim{n}",
+                )
+            )
+        except ValueError:
+            continue
+        discounted += 1
+        projection = projections[applied.campaign_id]
+        projection.redemptions += 1
+        projection.spend += applied.applied_discount
+        exhausted = projection.spend >= projection.total_budget - 0.01 or (
+            projection.max_uses_overall is not None
+            and projection.redemptions >= projection.max_uses_overall
+        )
+        if exhausted and projection.exhausted_at is None:
+            projection.exhausted_at = checkout.at
+
+    db.close()
+    engine.dispose()
+
+    result = ScenarioResult(
+        scenario=scenario.name,
+        checkouts=len(checkouts),
+        discounted_checkouts=discounted,
+        replay_start=checkouts[0].at if checkouts else None,
+        replay_end=checkouts[-1].at if checkouts else None,
+    )
+    for cid, projection in projections.items():
+        if result.replay_start is not None:
+            began = max(result.replay_start, starts[cid])
+            ended = projection.exhausted_at or result.replay_end
+            days = max((ended - began).total_seconds() / 86400, 1 / 24)
+            projection.spend_per_day = round(projection.spend / days, 2)
+            if projection.exhausted_at is not None:
+                projection.hours_to_exhaustion = round(
+                    (projection.exhausted_at - began).total_seconds() / 3600, 2
+                )
+        projection.spend = round(projection.spend, 2)
+        result.campaigns.append(projection)
+    result.campaigns.sort(key=lambda p: (not p.proposed, -p.spend))
+    return result
+
+
+_worker_checkouts: List[Checkout] = []
+_worker_existing: List[dict] = []
+
+
+def _init_worker(checkouts: List[Checkout], existing: List[dict]) -> None:
+    global _worker_checkouts, _worker_existing
+    _worker_checkouts, _worker_existing = checkouts, existing
+
+
+def _simulate_in_worker(scenario: Scenario, choice: str) -> ScenarioResult:
+    return simulate(scenario, _worker_checkouts, _worker_existing, choice)
+
+
+def build_scenarios(
+    proposals: List[schemas.CampaignCreate], include_existing: bool, each: bool
+) -> List[Scenario]:
+    dumped = [p.model_dump() for p in proposals]
+    scenarios = []
+    if include_existing:
+        scenarios.append(Scenario("baseline", [], include_existing))
+    scenarios.append(Scenario("all proposals", dumped, include_existing))
+    if each and len(dumped) > 1:
+        scenarios.extend(
+            Scenario(f"only {p['name']}", [p], include_existing) for p in dumped
+        )
+    return scenarios
+
+
+def run(
+    scenarios: List[Scenario],
+    checkouts: List[Checkout],
+    existing: List[dict],
+    workers: Optional[int] = None,
+    choice: str = "priority",
+) -> List[ScenarioResult]:
+    """Simulate each scenario in its own worker process."""
+    workers = workers or min(len(scenarios), os.cpu_count() or 1)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(checkouts, existing)
+    ) as pool:
+        return list(
+            pool.map(_simulate_in_worker, scenarios, [choice] * len(scenarios))
+        )
+
+
+def shift_checkouts(checkouts: List[Checkout], start: datetime) -> List[Checkout]:
+    """Move the replay so its first checkout happens at `start`."""
+    if not checkouts:
+        return checkouts
+    offset = start - checkouts[0].at
+    return [c._replace(at=c.at + offset) for c in checkouts]
+
+
+def _parse_shift(value: str, proposals: List[schemas.CampaignCreate], checkouts):
+    if value == "none" or not checkouts:
+        return None
+    if value == "auto":
+        # Proposals usually start after the history ends; replay the history
+        # from their earliest start so they get a chance to be offered.
+        start = min(p.start_date for p in proposals)
+        return start if start > checkouts[-1].at else None
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None):
+    from .config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("proposals", help="JSON list of CampaignCreate objects")
+    parser.add_argument("--checkouts", default=None, help="JSONL checkout log")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--cart-total", type=float, default=800.0)
+    parser.add_argument("--delivery-charge", type=float, default=40.0)
+    parser.add_argument("--no-existing", action="store_true", help="proposals only")
+    parser.add_argument("--no-each", action="store_true", help="skip per-proposal runs")
+    parser.add_argument(
+        "--choice", choices=("priority", "best"), default="priority",
+        help="which offer a customer takes: highest priority or largest discount",
+    )
+    parser.add_argument(
+        "--shift-to", default="auto",
+        help="ISO time the replay starts at, 'auto' (earliest proposal start "
+        "if the history precedes it) or 'none'",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    with open(args.proposals) as fh:
+        proposals = [schemas.CampaignCreate(**item) for item in json.load(fh)]
+
+    # Read-only: the simulation never writes to the configured database.
+    database = Database(replace(settings, db_create_schema=False))
+    db = database.ReadSessionLocal()
+    try:
+        if args.checkouts:
+            checkouts = load_checkouts_jsonl(args.checkouts)
+        else:
+            checkouts = load_checkouts_from_redemptions(
+                db, args.since, args.until, args.cart_total, args.delivery_charge
+            )
+        existing = [] if args.no_existing else snapshot_live_campaigns(db, datetime.utcnow())
+    finally:
+        db.close()
+        database.dispose()
+
+    start = _parse_shift(args.shift_to, proposals, checkouts)
+    if start is not None:
+        checkouts = shift_checkouts(checkouts, start)
+
+    scenarios = build_scenarios(proposals, not args.no_existing, not args.no_each)
+    results = run(scenarios, checkouts, existing, args.workers, args.choice)
+
+    for result in results:
+        print(
+            f"\n== {result.scenario}: {result.discounted_checkouts}/{result.checkouts} "
+            f"checkouts discounted ({result.replay_start} .. {result.replay_end})"
+        )
+        for p in result.campaigns:
+            if not p.proposed and not p.offered:
+                continue
+            exhausted = (
+                f"exhausted after {p.hours_to_exhaustion} h" if p.exhausted_at else "not exhausted"
+            )
+            print(
+                f"  {'*' if p.proposed else ' '} {p.name:<40} {p.redemptions:>7} redemptions  "
+                f"spend {p.spend:>12.2f} / {p.total_budget:<12.2f} "
+                f"{p.spend_per_day:>10.2f}/day  {exhausted}"
+            )
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump([asdict(r) for r in results], fh, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
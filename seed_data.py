@@ -1,8 +1,30 @@
 # seed_data.py
+"""
+Seed the database.
+
+    python seed_data.py                 three hand-written sample campaigns
+    python seed_data.py --generate      production-shaped synthetic data, e.g.
+        --campaigns 20000 --redemptions 2000000 --customers 200000 --seed 7
+
+The generator is reproducible from --seed and writes with bulk Core inserts
+in large transactions. Generated campaigns are also appended to the campaign
+change feed, so running apps pick them up on their next cache sync.
+"""
+import argparse
+import math
+import random
+import time
 from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
 
 from discount_service.database import Base, engine, SessionLocal
 from discount_service import models
+from discount_service.discount_strategies import DiscountStrategyFactory
+from discount_service.repositories import CampaignRepository
 
 
 def get_or_create_campaign(db, code: str, defaults: dict) -> models.Campaign:
@@ -15,18 +37,13 @@ def get_or_create_campaign(db, code: str, defaults: dict) -> models.Campaign:
         print(f"Campaign with code '{code}' already exists (id={campaign.id}). Skipping create.")
         return campaign
 
-    campaign = models.Campaign(code=code, **defaults)
-    db.add(campaign)
-    db.commit()
-    db.refresh(campaign)
+    # Through the repository so the write lands in the campaign change feed.
+    campaign = CampaignRepository(db).create(models.Campaign(code=code, **defaults))
     print(f"Created campaign '{campaign.name}' with id={campaign.id} and code='{campaign.code}'")
     return campaign
 
 
-def main():
-    # Ensure tables exist
-    Base.metadata.create_all(bind=engine)
-
+def seed_sample_campaigns():
     db = SessionLocal()
     try:
         now = datetime.utcnow()
@@ -79,8 +96,7 @@ def main():
                 models.CampaignTargetCustomer(customer_id="custA"),
                 models.CampaignTargetCustomer(customer_id="custB"),
             ]
-            db.add(del50)
-            db.commit()
+            CampaignRepository(db).save(del50)
             print("Added target customers [custA, custB] to DEL50 campaign.")
 
         # 3) High priority: 20% off cart, but min cart 1500, small budget
@@ -114,5 +130,273 @@ def main():
         db.close()
 
 
+def _skewed_weights(rng: random.Random, count: int, exponent: float) -> List[float]:
+    """Zipf-like popularity, randomly assigned: a few items get most of the traffic."""
+    weights = [1.0 / (rank + 1) ** exponent for rank in range(count)]
+    rng.shuffle(weights)
+    return weights
+
+
+def _generated_campaign(
+    rng: random.Random, i: int, seed: int, now: datetime, days: int, expected_uses: float
+) -> dict:
+    kind = rng.random()
+    if kind < 0.65:  # live
+        start = now - timedelta(days=rng.uniform(0, days), hours=1)
+        end = now + timedelta(days=rng.uniform(1, 60))
+    elif kind < 0.85:  # expired within the history window
+        end = now - timedelta(days=rng.uniform(1, days))
+        start = end - timedelta(days=rng.uniform(3, 60))
+    else:  # not started yet
+        start = now + timedelta(days=rng.uniform(1, 30))
+        end = start + timedelta(days=rng.uniform(3, 60))
+
+    value_type = rng.choice(list(models.DiscountValueType))
+    # Sized to the campaign's popularity; some hot campaigns still run dry.
+    budget = round(
+        max(rng.lognormvariate(8.5, 1.2), expected_uses * 60.0 * rng.uniform(0.7, 2.5)), 2
+    )
+    return {
+        "name": f"Generated {i}",
+        # Only some campaigns are redeemable by code.
+        "code": f"GEN{seed}-{i}" if rng.random() < 0.3 else None,
+        "discount_scope": (
+            models.DiscountScope.CART if rng.random() < 0.7 else models.DiscountScope.DELIVERY
+        ),
+        "discount_value_type": value_type,
+        "discount_value": float(
+            rng.choice([5, 10, 15, 20, 25, 50])
+            if value_type == models.DiscountValueType.PERCENT
+            else rng.choice([20, 30, 50, 75, 100])
+        ),
+        "max_discount_amount": rng.choice([None, 100.0, 200.0, 500.0]),
+        "start_date": start,
+        "end_date": end,
+        "total_budget": budget,
+        "min_cart_total": rng.choice([None, 0.0, 200.0, 500.0, 1500.0]),
+        "min_delivery_charge": rng.choice([None, None, 20.0, 40.0]),
+        "max_transactions_per_customer_per_day": rng.choice([1, 1, 1, 2, 3]),
+        "max_uses_overall": rng.choice(
+            [None, None, int(expected_uses * rng.uniform(0.8, 3.0)) + 10]
+        ),
+        "allow_stack_with_other_discounts": False,
+        "priority": rng.randint(0, 20),
+        "is_active": rng.random() < 0.97,
+    }
+
+
+def generate(
+    campaigns: int,
+    redemptions: int,
+    customers: int,
+    days: int = 30,
+    targeted_share: float = 0.15,
+    seed: int = 42,
+    batch_size: int = 50_000,
+    now: Optional[datetime] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> dict:
+    """
+    Bulk-generate campaigns, target lists and `days` of redemption history.
+
+    Popularity is skewed: a few hot campaigns take most redemptions and
+    heavy customers redeem far more often than the rest (and appear on more
+    target lists). Redemptions respect each campaign's date range, budget,
+    overall uses and per-customer daily limit, as the service would; picks
+    that would have been refused are redrawn, so up to `redemptions` rows
+    are written. With the same seed and `now`, the data is identical.
+    Raises ValueError if data for `seed` is already in the database.
+    """
+    rng = random.Random(seed)
+    now = (now or datetime.utcnow()).replace(microsecond=0)
+    started = time.perf_counter()
+
+    db = session_factory()
+    try:
+        existing = (
+            db.query(models.Campaign.id)
+            .filter(models.Campaign.code.like(f"GEN{seed}-%"))
+            .first()
+        )
+        if existing:
+            raise ValueError(
+                f"Data for seed {seed} already exists; use another seed or a fresh database."
+            )
+
+        # Campaigns, their targets and change-feed entries: one transaction.
+        popularity = _skewed_weights(rng, campaigns, 1.1)
+        total_popularity = sum(popularity) or 1.0
+        rows = [
+            _generated_campaign(
+                rng, i, seed, now, days, redemptions * popularity[i] / total_popularity
+            )
+            for i in range(campaigns)
+        ]
+        last_id = (
+            db.query(models.Campaign.id).order_by(models.Campaign.id.desc()).limit(1).scalar()
+        )
+        conn = db.connection()
+        for start in range(0, len(rows), batch_size):
+            conn.execute(insert(models.Campaign.__table__), rows[start:start + batch_size])
+        ids = [
+            row[0]
+            for row in db.query(models.Campaign.id)
+            .filter(models.Campaign.id > (last_id or 0))
+            .order_by(models.Campaign.id)
+        ]
+
+        customer_ids = [f"cust{i}" for i in range(customers)]
+        customer_cum = list(accumulate(_skewed_weights(rng, customers, 1.0)))
+        targets: Dict[int, List[str]] = {}
+        target_rows = []
+        for cid in ids:
+            if rng.random() >= targeted_share:
+                continue
+            # Mostly short lists, a long tail of very large ones.
+            size = min(customers, int(rng.lognormvariate(3.0, 1.5)) + 1)
+            targets[cid] = sorted(
+                set(rng.choices(customer_ids, cum_weights=customer_cum, k=size))
+            )
+            target_rows.extend({"campaign_id": cid, "customer_id": c} for c in targets[cid])
+        for start in range(0, len(target_rows), batch_size):
+            conn.execute(
+                insert(models.CampaignTargetCustomer.__table__),
+                target_rows[start:start + batch_size],
+            )
+
+        versions = CampaignRepository(db).changes.record_many(
+            ids, models.CampaignChangeOp.CREATED
+        )
+        db.execute(
+            update(models.Campaign),
+            [{"id": cid, "version": v} for cid, v in zip(ids, versions)],
+        )
+        db.commit()
+
+        spent = [0.0] * len(ids)
+        uses = [0] * len(ids)
+        exhausted = set()
+        written = refused = 0
+        # Oldest day first, one transaction per day, so ids follow created_at.
+        # Calendar days (UTC), like the daily limit; the last one is today so far.
+        midnight = datetime.combine(now.date(), datetime.min.time())
+        for day in range(days - 1, -1, -1):
+            day_start = midnight - timedelta(days=day)
+            day_end = min(day_start + timedelta(days=1), now)
+            quota = redemptions * (days - day) // days - written
+            daily_counts: Dict[tuple, int] = {}
+            batch = []
+            for _ in range(10):
+                live = [
+                    i
+                    for i, camp in enumerate(rows)
+                    if camp["is_active"]
+                    and camp["start_date"] < day_end
+                    and camp["end_date"] > day_start
+                    and i not in exhausted
+                ]
+                need = quota - len(batch)
+                if need <= 0 or not live:
+                    break
+                live_cum = list(accumulate(popularity[i] for i in live))
+                picks = rng.choices(live, cum_weights=live_cum, k=need)
+                shoppers = rng.choices(customer_ids, cum_weights=customer_cum, k=need)
+                for i, customer_id in zip(picks, shoppers):
+                    camp, cid = rows[i], ids[i]
+                    max_uses = camp["max_uses_overall"]
+                    remaining = camp["total_budget"] - spent[i]
+                    if (max_uses is not None and uses[i] >= max_uses) or remaining < 1.0:
+                        exhausted.add(i)
+                        refused += 1
+                        continue
+                    if cid in targets:
+                        customer_id = rng.choice(targets[cid])
+                    key = (i, customer_id)
+                    if daily_counts.get(key, 0) >= camp["max_transactions_per_customer_per_day"]:
+                        refused += 1
+                        continue
+                    if camp["discount_scope"] == models.DiscountScope.CART:
+                        base = rng.uniform(150.0, 3000.0)
+                    else:
+                        base = rng.uniform(20.0, 80.0)
+                    strategy = DiscountStrategyFactory.get_strategy(camp["discount_value_type"])
+                    amount = strategy.compute(
+                        base_amount=base,
+                        discount_value=camp["discount_value"],
+                        max_discount_amount=camp["max_discount_amount"],
+                        remaining_budget=remaining,
+                    )
+                    # Round down so rounding never pushes spend past the budget.
+                    amount = math.floor(amount * 100) / 100
+                    if amount <= 0:
+                        refused += 1
+                        continue
+                    window_start = max(day_start, camp["start_date"])
+                    window = (min(day_end, camp["end_date"]) - window_start).total_seconds()
+                    daily_counts[key] = daily_counts.get(key, 0) + 1
+                    spent[i] += amount
+                    uses[i] += 1
+                    batch.append(
+                        {
+                            "campaign_id": cid,
+                            "customer_id": customer_id,
+                            "discount_amount": amount,
+                            "created_at": window_start
+                            + timedelta(seconds=rng.uniform(0, max(window - 1, 0))),
+                            "order_id": f"gen{seed}-{written + len(batch)}",
+                        }
+                    )
+            batch.sort(key=lambda r: r["created_at"])
+            conn = db.connection()
+            for start in range(0, len(batch), batch_size):
+                conn.execute(
+                    insert(models.DiscountRedemption.__table__), batch[start:start + batch_size]
+                )
+            db.commit()
+            written += len(batch)
+    finally:
+        db.close()
+
+    return {
+        "campaigns": len(ids),
+        "targets": len(target_rows),
+        "redemptions": written,
+        # Redrawn picks a real checkout would have refused (limits, budget).
+        "refused": refused,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the discount database.")
+    parser.add_argument("--generate", action="store_true", help="bulk synthetic data")
+    parser.add_argument("--campaigns", type=int, default=20_000)
+    parser.add_argument("--redemptions", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=30, help="history length")
+    parser.add_argument("--targeted-share", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Ensure tables exist
+    Base.metadata.create_all(bind=engine)
+
+    if args.generate:
+        try:
+            summary = generate(
+                campaigns=args.campaigns,
+                redemptions=args.redemptions,
+                customers=args.customers,
+                days=args.days,
+                targeted_share=args.targeted_share,
+                seed=args.seed,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        print(summary)
+    else:
+        seed_sample_campaigns()
+
+
 if __name__ == "__main__":
     main()
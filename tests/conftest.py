@@ -0,0 +1,62 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# Point the app at a throwaway database instead of ./campaigns.db so the suite
+# can be re-run; set DISCOUNT_DATABASE_URL to test against another backend.
+_db_dir = tempfile.mkdtemp(prefix="discount-tests-")
+os.environ.setdefault(
+    "DISCOUNT_DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+)
+
+from discount_service import models  # noqa: E402,F401
+from discount_service.database import engine, verify_schema  # noqa: E402
+
+# Module-level TestClient(app) instances do not run the lifespan hook, so
+# create the schema up front.
+verify_schema(engine, create_missing=True)
+
+from dataclasses import replace  # noqa: E402
+
+import pytest  # noqa: E402
+
+from discount_service.config import settings  # noqa: E402
+from discount_service.database import Database  # noqa: E402
+from discount_service.main import create_app  # noqa: E402
+
+
+@pytest.fixture
+def app_settings(tmp_path):
+    """Settings for a fresh database (and profiles directory) under tmp_path."""
+    return replace(
+        settings,
+        database_url=f"sqlite:///{tmp_path / 'app.db'}",
+        profiling_dir=str(tmp_path / "profiles"),
+    )
+
+
+@pytest.fixture
+def make_app(app_settings):
+    """
+    Build apps on the test's database, with per-call setting overrides.
+    Their engines are disposed at teardown, even when the test fails.
+    """
+    apps = []
+
+    def factory(**overrides):
+        app = create_app(replace(app_settings, **overrides))
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        app.state.database.dispose()
+
+
+@pytest.fixture
+def database(app_settings):
+    """A Database on the test's file with the schema created."""
+    db = Database(app_settings)
+    verify_schema(db.engine, create_missing=True)
+    yield db
+    db.dispose()
@@ -0,0 +1,157 @@
+# tests/test_admission.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from discount_service import models, schemas
+from discount_service.admission import AdmissionLimiter, DeadlineExceeded
+from discount_service.repositories import CampaignRepository, DiscountRepository
+from discount_service.services import DiscountService
+
+
+def test_limiter_rejects_when_queue_full_and_times_out_waiters():
+    async def scenario():
+        limiter = AdmissionLimiter(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        assert await limiter.acquire(None) is None
+        waiter = asyncio.ensure_future(limiter.acquire(None))
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        assert await limiter.acquire(None) == 429
+        assert await waiter == 503
+        assert limiter.waiting == 0
+
+        # A waiter past its own deadline gets 504, not 503.
+        assert await limiter.acquire(time.monotonic() + 0.01) == 504
+
+        # Releasing hands the slot to the next waiter without freeing it.
+        waiter = asyncio.ensure_future(limiter.acquire(None))
+        await asyncio.sleep(0)
+        limiter.release()
+        assert await waiter is None
+        assert limiter.in_flight == 1
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_cancelled_waiters_do_not_hold_slots():
+    async def scenario():
+        limiter = AdmissionLimiter(max_concurrent=1, max_queue=2, queue_timeout=5.0)
+        assert await limiter.acquire(None) is None
+
+        # Cancelled while queued: no longer counts as waiting.
+        waiter = asyncio.ensure_future(limiter.acquire(None))
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        assert limiter.waiting == 0
+
+        # Cancelled right after release() handed it the slot: the slot is
+        # either given back or admitted, never leaked.
+        waiter = asyncio.ensure_future(limiter.acquire(None))
+        await asyncio.sleep(0)
+        limiter.release()
+        waiter.cancel()
+        try:
+            assert await waiter is None
+            limiter.release()
+        except asyncio.CancelledError:
+            pass
+        assert limiter.in_flight == 0
+        assert limiter.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def create_campaign(client):
+    now = datetime.utcnow()
+    r = client.post(
+        "/campaigns",
+        json={
+            "name": "Busy",
+            "discount_scope": "cart",
+            "discount_value_type": "flat",
+            "discount_value": 5.0,
+            "start_date": (now - timedelta(days=1)).isoformat(),
+            "end_date": (now + timedelta(days=1)).isoformat(),
+            "total_budget": 50.0,
+            "max_transactions_per_customer_per_day": 1,
+        },
+    )
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def test_expired_deadline_is_rejected_before_running(make_app):
+    app = make_app(admission_enabled=True)
+    body = {"customer_id": "a1", "cart_total": 100.0, "delivery_charge": 10.0}
+    with TestClient(app) as client:
+        campaign_id = create_campaign(client)
+        r = client.post(
+            "/discounts/apply",
+            json={**body, "campaign_id": campaign_id},
+            headers={"X-Request-Deadline": str(time.time() - 1)},
+        )
+        assert r.status_code == 504
+        r = client.post(
+            "/discounts/apply",
+            json={**body, "campaign_id": campaign_id},
+            headers={"X-Request-Timeout-Ms": "5000"},
+        )
+        assert r.status_code == 200, r.text
+
+
+def test_apply_writes_nothing_once_deadline_passed(database):
+    now = datetime.utcnow()
+    db = database.SessionLocal()
+    try:
+        campaign = CampaignRepository(db).create(
+            models.Campaign(
+                name="Late",
+                discount_scope=models.DiscountScope.CART,
+                discount_value_type=models.DiscountValueType.FLAT,
+                discount_value=5.0,
+                start_date=now - timedelta(days=1),
+                end_date=now + timedelta(days=1),
+                total_budget=50.0,
+                max_transactions_per_customer_per_day=1,
+                is_active=True,
+            )
+        )
+        service = DiscountService(CampaignRepository(db), DiscountRepository(db))
+        req = schemas.DiscountApplyRequest(
+            campaign_id=campaign.id, customer_id="a3", cart_total=100.0, delivery_charge=0.0
+        )
+        with pytest.raises(DeadlineExceeded):
+            service.apply_discount(req, deadline=time.monotonic() - 1)
+        assert service.discount_repo.count_redemptions_for_campaign(campaign.id) == 0
+        result = service.apply_discount(req, deadline=time.monotonic() + 5)
+        assert result.applied_discount == 5.0
+    finally:
+        db.close()
+
+
+def test_degraded_available_returns_provisional_results(make_app):
+    # Degrading at one in-flight request makes every available call cheap.
+    app = make_app(admission_enabled=True, admission_available_degrade_at=1)
+    body = {"customer_id": "a2", "cart_total": 100.0, "delivery_charge": 10.0}
+    with TestClient(app) as client:
+        campaign_id = create_campaign(client)
+        # Used up for today; only the full check knows.
+        assert client.post("/discounts/apply", json={**body, "campaign_id": campaign_id}).status_code == 200
+
+        r = client.post("/discounts/available", json=body)
+        assert r.status_code == 200
+        assert r.headers["X-Discounts-Provisional"] == "true"
+        assert [c["provisional"] for c in r.json()] == [True]
+
+        health = client.get("/health/ready").json()
+        assert health["admission"]["available"] == {"in_flight": 0, "waiting": 0}
@@ -0,0 +1,59 @@
+# tests/test_app_factory.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from fastapi.testclient import TestClient
+
+
+def test_create_app_does_not_touch_database(make_app, tmp_path):
+    app = make_app()
+    assert not (tmp_path / "app.db").exists()
+
+    r = TestClient(app).get("/health/ready")
+    assert r.status_code == 503
+
+
+def test_lifespan_creates_schema_and_warms_up(make_app):
+    now = datetime.utcnow()
+    with TestClient(make_app()) as client:
+        assert client.get("/health/ready").status_code == 200
+        r = client.post(
+            "/campaigns",
+            json={
+                "name": "Factory",
+                "discount_scope": "cart",
+                "discount_value_type": "flat",
+                "discount_value": 5.0,
+                "start_date": now.isoformat(),
+                "end_date": (now + timedelta(days=1)).isoformat(),
+                "total_budget": 50.0,
+                "max_transactions_per_customer_per_day": 1,
+            },
+        )
+        assert r.status_code == 200, r.text
+
+    with TestClient(make_app()) as client:
+        ready = client.get("/health/ready").json()
+        assert ready["status"] == "ready"
+        assert ready["cached_campaigns"] == 1
+
+
+def test_lifespan_fails_on_missing_schema(make_app):
+    app = make_app(db_create_schema=False)
+    with pytest.raises(RuntimeError, match="missing tables"):
+        with TestClient(app):
+            pass
+
+
+def test_lifespan_adds_defaulted_columns_to_existing_tables(make_app, app_settings):
+    with TestClient(make_app()):
+        pass
+    # A database from before campaigns.version existed.
+    engine = create_engine(app_settings.database_url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE campaigns DROP COLUMN version")
+    engine.dispose()
+
+    with TestClient(make_app()) as client:
+        assert client.get("/campaigns").status_code == 200
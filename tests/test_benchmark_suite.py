@@ -0,0 +1,26 @@
+# tests/test_benchmark_suite.py
+import json
+
+from benchmarks import suite
+
+
+def test_suite_runs_and_compares_against_baseline(tmp_path):
+    out = tmp_path / "bench.json"
+    argv = [
+        "--campaigns", "5", "--targets", "2", "--redemptions", "20",
+        "--customers", "10", "--calls", "2", "--warmup", "0",
+    ]
+    assert suite.main(argv + ["--output", str(out)]) == 0
+
+    report = json.loads(out.read_text())
+    cases = {row["case"] for row in report["results"]}
+    assert {"available.cached", "apply", "list.first", "strategy.flat"} <= cases
+    apply = next(row for row in report["results"] if row["case"] == "apply")
+    assert apply["queries_per_call"] > 0
+
+    # Pretend the baseline issued fewer queries: that is a regression.
+    for row in report["results"]:
+        row["queries_per_call"] = max(row["queries_per_call"] - 1, 0)
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report))
+    assert suite.main(argv + ["--baseline", str(baseline), "--fail-on-regression"]) == 1
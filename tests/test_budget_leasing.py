@@ -0,0 +1,170 @@
+# tests/test_budget_leasing.py
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from discount_service import models, schemas
+from discount_service.database import Base
+from discount_service.budget_leasing import BudgetLeaseManager
+from discount_service.repositories import CampaignRepository, DiscountRepository
+from discount_service.services import DiscountService
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'leases.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def create_campaign(session_factory, total_budget, max_uses_overall=None):
+    now = datetime.utcnow()
+    db = session_factory()
+    campaign = models.Campaign(
+        name="Hot flat 10",
+        discount_scope=models.DiscountScope.CART,
+        discount_value_type=models.DiscountValueType.FLAT,
+        discount_value=10.0,
+        start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+        total_budget=total_budget,
+        max_transactions_per_customer_per_day=1,
+        max_uses_overall=max_uses_overall,
+        is_active=True,
+    )
+    campaign = CampaignRepository(db).create(campaign)
+    db.close()
+    return campaign.id
+
+
+def apply_all(session_factory, manager, campaign_id, customers):
+    applied = 0
+    db = session_factory()
+    service = DiscountService(
+        CampaignRepository(db), DiscountRepository(db), budget_leases=manager
+    )
+    for customer_id in customers:
+        req = schemas.DiscountApplyRequest(
+            campaign_id=campaign_id,
+            customer_id=customer_id,
+            cart_total=100.0,
+            delivery_charge=0.0,
+        )
+        try:
+            service.apply_discount(req)
+            applied += 1
+        except ValueError:
+            pass
+    db.close()
+    return applied
+
+
+def total_spent(session_factory, campaign_id):
+    db = session_factory()
+    try:
+        return DiscountRepository(db).get_total_discount_for_campaign(campaign_id)
+    finally:
+        db.close()
+
+
+def test_leased_workers_never_exceed_budget(session_factory):
+    campaign_id = create_campaign(session_factory, total_budget=95.0)
+    worker_a = BudgetLeaseManager(session_factory, budget_slice=30.0, worker_id="a")
+    worker_b = BudgetLeaseManager(session_factory, budget_slice=30.0, worker_id="b")
+
+    apply_all(session_factory, worker_a, campaign_id, [f"a{i}" for i in range(5)])
+    apply_all(session_factory, worker_b, campaign_id, [f"b{i}" for i in range(20)])
+    apply_all(session_factory, worker_a, campaign_id, [f"c{i}" for i in range(20)])
+
+    assert total_spent(session_factory, campaign_id) <= 95.0
+
+
+def test_max_uses_overall_respected_across_workers(session_factory):
+    campaign_id = create_campaign(
+        session_factory, total_budget=10000.0, max_uses_overall=7
+    )
+    worker_a = BudgetLeaseManager(session_factory, uses_slice=4, worker_id="a")
+    worker_b = BudgetLeaseManager(session_factory, uses_slice=4, worker_id="b")
+
+    applied = apply_all(session_factory, worker_a, campaign_id, ["a1", "a2"])
+    applied += apply_all(session_factory, worker_b, campaign_id, [f"b{i}" for i in range(10)])
+    # a still holds two unused uses until it hands its slice back.
+    assert applied == 5
+
+    worker_a.return_all()
+    applied += apply_all(session_factory, worker_b, campaign_id, [f"c{i}" for i in range(10)])
+    assert applied == 7
+
+    db = session_factory()
+    count = db.query(func.count(models.DiscountRedemption.id)).scalar()
+    db.close()
+    assert count == 7
+
+
+def test_concurrent_renewals_need_one_connection_per_request(tmp_path):
+    # One connection per thread: a renewal that opened a second pooled
+    # connection while holding the manager lock would time out here.
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'contended.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+        poolclass=QueuePool,
+        pool_size=4,
+        max_overflow=0,
+        pool_timeout=10,
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    campaign_id = create_campaign(factory, total_budget=155.0, max_uses_overall=40)
+    # A slice of one discount forces a renewal on nearly every apply.
+    manager = BudgetLeaseManager(factory, budget_slice=10.0, uses_slice=1, worker_id="w")
+
+    errors = []
+    applied = []
+
+    def worker(n):
+        try:
+            applied.append(
+                apply_all(factory, manager, campaign_id, [f"t{n}-{i}" for i in range(6)])
+            )
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # The whole budget is used, never more; the last 5 may be split into
+    # partial discounts while other reservations are still in flight.
+    assert total_spent(factory, campaign_id) == 155.0
+    assert sum(applied) >= 16
+    engine.dispose()
+
+
+def test_return_all_does_not_hold_the_lease_lock_during_db_io(session_factory):
+    campaign_id = create_campaign(session_factory, total_budget=100.0)
+    lock_held = []
+
+    def checking_factory():
+        lock_held.append(manager._lock.locked())
+        return session_factory()
+
+    manager = BudgetLeaseManager(checking_factory, budget_slice=30.0, worker_id="a")
+    apply_all(session_factory, manager, campaign_id, ["a1"])
+    manager.return_all()
+
+    assert lock_held == [False]
+    db = session_factory()
+    assert db.query(models.CampaignBudgetLease).count() == 0
+    db.close()
+    # The next reservation leases afresh.
+    assert apply_all(session_factory, manager, campaign_id, ["a2"]) == 1
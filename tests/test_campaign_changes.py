@@ -0,0 +1,80 @@
+# tests/test_campaign_changes.py
+import threading
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from discount_service.main import app
+from discount_service.repositories import CampaignChangeRepository
+
+client = TestClient(app)
+
+
+def campaign_payload(name):
+    now = datetime.utcnow()
+    return {
+        "name": name,
+        "discount_scope": "delivery",
+        "discount_value_type": "flat",
+        "discount_value": 20.0,
+        "start_date": now.isoformat(),
+        "end_date": (now + timedelta(days=1)).isoformat(),
+        "total_budget": 100.0,
+        "max_transactions_per_customer_per_day": 1,
+    }
+
+
+def test_changes_since_version():
+    start = client.get("/campaigns/changes").json()
+    while start["has_more"]:
+        start = client.get(f"/campaigns/changes?since={start['last_version']}").json()
+    since = start["last_version"]
+
+    r = client.post("/campaigns", json=campaign_payload("Feed A"))
+    assert r.status_code == 200, r.text
+    a_id = r.json()["id"]
+    r = client.post("/campaigns", json=campaign_payload("Feed B"))
+    b_id = r.json()["id"]
+    r = client.put(f"/campaigns/{a_id}", json=campaign_payload("Feed A v2"))
+    assert r.status_code == 200, r.text
+    r = client.delete(f"/campaigns/{b_id}")
+    assert r.status_code == 204
+
+    r = client.get(f"/campaigns/changes?since={since}")
+    assert r.status_code == 200, r.text
+    feed = r.json()
+    by_id = {c["campaign_id"]: c for c in feed["changes"]}
+    assert by_id[a_id]["op"] == "updated"
+    assert by_id[a_id]["campaign"]["name"] == "Feed A v2"
+    assert by_id[b_id]["op"] == "deleted"
+    assert by_id[b_id]["campaign"] is None
+    assert feed["last_version"] == since + 4
+    assert not feed["has_more"]
+
+    r2 = client.get(f"/campaigns/changes?since={feed['last_version']}")
+    assert r2.json()["changes"] == []
+
+
+def test_first_writes_allocate_distinct_versions_concurrently(database):
+    # Every thread finds the counter row missing at once.
+    barrier = threading.Barrier(6)
+    versions, errors = [], []
+
+    def allocate():
+        db = database.SessionLocal()
+        try:
+            barrier.wait()
+            versions.append(CampaignChangeRepository(db)._allocate_versions(2))
+            db.commit()
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=allocate) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(versions) == [2, 4, 6, 8, 10, 12]
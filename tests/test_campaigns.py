@@ -43,3 +43,37 @@ def test_create_and_list_campaign():
     assert page["page_size"] == 10
     assert page["total_items"] >= 1
     assert len(page["items"]) >= 1
+
+
+def test_campaign_etags_revalidate_without_body():
+    now = datetime.utcnow()
+    payload = {
+        "name": "Tagged",
+        "discount_scope": "cart",
+        "discount_value_type": "flat",
+        "discount_value": 5.0,
+        "start_date": now.isoformat(),
+        "end_date": (now + timedelta(days=7)).isoformat(),
+        "total_budget": 100.0,
+        "max_transactions_per_customer_per_day": 1,
+        "target_customer_ids": ["cust1"],
+    }
+    created = client.post("/campaigns", json=payload).json()
+    url = f"/campaigns/{created['id']}"
+
+    r = client.get(url)
+    etag = r.headers["etag"]
+    assert r.json()["version"] == created["version"] > 0
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b""
+
+    list_etag = client.get("/campaigns").headers["etag"]
+    assert client.get("/campaigns", headers={"If-None-Match": list_etag}).status_code == 304
+
+    # Changing only the targets is a new version too.
+    client.put(url, json={**payload, "is_active": True, "target_customer_ids": ["cust2"]})
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["target_customer_ids"] == ["cust2"]
+    assert r.headers["etag"] != etag
+    assert client.get("/campaigns", headers={"If-None-Match": list_etag}).status_code == 200
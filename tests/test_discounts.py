@@ -2,6 +2,8 @@
 from datetime import datetime, timedelta
 
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+
 from discount_service.main import app
 
 client = TestClient(app)
@@ -64,3 +66,47 @@ def test_available_and_apply_discount():
 
     r3 = client.post("/discounts/apply", json=apply_payload)
     assert r3.status_code == 400
+
+
+def test_code_lookup_and_apply_by_code_without_db_for_unknown_codes(make_app):
+    code_app = make_app(code_index_max_staleness_ms=60_000)
+    now = datetime.utcnow()
+    with TestClient(code_app) as code_client:
+        r = code_client.post(
+            "/campaigns",
+            json={
+                "name": "Spring",
+                "code": "Spring25",
+                "discount_scope": "cart",
+                "discount_value_type": "flat",
+                "discount_value": 25.0,
+                "start_date": (now - timedelta(hours=1)).isoformat(),
+                "end_date": (now + timedelta(days=1)).isoformat(),
+                "total_budget": 100.0,
+                "max_transactions_per_customer_per_day": 1,
+            },
+        )
+        assert r.status_code == 200, r.text
+        campaign_id = r.json()["id"]
+
+        r = code_client.get("/discounts/code/SPRING25")
+        assert r.status_code == 200
+        assert r.json()["id"] == campaign_id
+        assert "target_customer_ids" not in r.json()
+
+        statements = []
+        # Lookups use the read engine, apply-by-code the write engine.
+        for engine in {code_app.state.database.engine, code_app.state.database.read_engine}:
+            event.listen(
+                engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+            )
+        assert code_client.get("/discounts/code/GUESS123").status_code == 404
+        body = {"customer_id": "c1", "cart_total": 100.0, "delivery_charge": 10.0}
+        r = code_client.post("/discounts/apply-by-code", json={**body, "code": "nope"})
+        assert r.status_code == 404
+        assert statements == []
+
+        r = code_client.post("/discounts/apply-by-code", json={**body, "code": " spring25 "})
+        assert r.status_code == 200, r.text
+        assert r.json()["campaign_id"] == campaign_id
+        assert r.json()["final_cart_total"] == 75.0
@@ -0,0 +1,149 @@
+# tests/test_eligibility.py
+from datetime import datetime, timedelta
+
+from dataclasses import replace
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from discount_service import models, schemas
+from discount_service.database import Database, verify_schema
+from discount_service.eligibility import CampaignRuleCache
+from discount_service.main import app
+from discount_service.repositories import CampaignRepository, DiscountRepository
+from discount_service.services import DiscountService
+
+client = TestClient(app)
+
+
+def campaign_payload(targets):
+    now = datetime.utcnow()
+    return {
+        "name": "Targeted cart 15",
+        "discount_scope": "cart",
+        "discount_value_type": "percent",
+        "discount_value": 15.0,
+        "max_discount_amount": 30.0,
+        "start_date": now.isoformat(),
+        "end_date": (now + timedelta(days=1)).isoformat(),
+        "total_budget": 500.0,
+        "min_cart_total": 100.0,
+        "max_transactions_per_customer_per_day": 1,
+        "target_customer_ids": targets,
+    }
+
+
+def available_ids(customer_id, cart_total=400.0):
+    r = client.post(
+        "/discounts/available",
+        json={"customer_id": customer_id, "cart_total": cart_total, "delivery_charge": 0.0},
+    )
+    assert r.status_code == 200, r.text
+    return {c["campaign"]["id"]: c for c in r.json()}
+
+
+def test_compiled_rules_follow_campaign_updates():
+    r = client.post("/campaigns", json=campaign_payload(["eligE"]))
+    assert r.status_code == 200, r.text
+    campaign_id = r.json()["id"]
+
+    offers = available_ids("eligE")
+    assert offers[campaign_id]["applicable_discount"] == 30.0
+    assert offers[campaign_id]["final_cart_total"] == 370.0
+    assert campaign_id not in available_ids("eligE", cart_total=50.0)
+    assert campaign_id not in available_ids("eligF")
+
+    r = client.put(f"/campaigns/{campaign_id}", json=campaign_payload(["eligF"]))
+    assert r.status_code == 200, r.text
+
+    assert campaign_id not in available_ids("eligE")
+    assert campaign_id in available_ids("eligF")
+
+
+def add_campaign(db, name):
+    now = datetime.utcnow()
+    CampaignRepository(db).create(
+        models.Campaign(
+            name=name,
+            discount_scope=models.DiscountScope.CART,
+            discount_value_type=models.DiscountValueType.FLAT,
+            discount_value=5.0,
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=1),
+            total_budget=100.0,
+            max_transactions_per_customer_per_day=1,
+            is_active=True,
+        )
+    )
+
+
+def test_rule_cache_ignores_a_lagging_replica(database, app_settings, tmp_path):
+    # The "replica" has only the first of the primary's two changes.
+    replica = Database(replace(app_settings, database_url=f"sqlite:///{tmp_path / 'replica.db'}"))
+    verify_schema(replica.engine, create_missing=True)
+    primary_db, replica_db = database.SessionLocal(), replica.SessionLocal()
+    try:
+        add_campaign(primary_db, "First")
+        add_campaign(primary_db, "Second")
+        add_campaign(replica_db, "First")
+
+        cache = CampaignRuleCache(render=DiscountService._to_campaign_out)
+        cache.sync(primary_db)
+        assert len(cache) == 2
+
+        statements = []
+        event.listen(
+            replica.engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+        )
+        cache.sync(replica_db)
+        assert len(cache) == 2
+        # Only the version was read; nothing was reloaded.
+        assert len(statements) == 1
+
+        cache.sync(primary_db)
+        assert len(cache) == 2
+    finally:
+        primary_db.close()
+        replica_db.close()
+        replica.dispose()
+
+
+def test_uncached_service_matches_compiled_rules(database):
+    db = database.SessionLocal()
+    try:
+        add_campaign(db, "Everyone")
+        repo = CampaignRepository(db)
+        repo.create(
+            models.Campaign(
+                name="Delivery, targeted",
+                discount_scope=models.DiscountScope.DELIVERY,
+                discount_value_type=models.DiscountValueType.PERCENT,
+                discount_value=50.0,
+                start_date=datetime.utcnow() - timedelta(days=1),
+                end_date=datetime.utcnow() + timedelta(days=1),
+                total_budget=100.0,
+                min_cart_total=200.0,
+                max_transactions_per_customer_per_day=1,
+                is_active=True,
+                targets=[models.CampaignTargetCustomer(customer_id="eligG")],
+            )
+        )
+        cached = DiscountService(
+            repo,
+            DiscountRepository(db),
+            rule_cache=CampaignRuleCache(render=DiscountService._to_campaign_out),
+        )
+        uncached = DiscountService(repo, DiscountRepository(db))
+        for customer_id, cart_total, offers in [
+            ("eligG", 300.0, 2),
+            ("eligG", 100.0, 1),
+            ("eligH", 300.0, 1),
+        ]:
+            req = schemas.DiscountCheckRequest(
+                customer_id=customer_id, cart_total=cart_total, delivery_charge=30.0
+            )
+            result = uncached.get_available_campaigns(req)
+            assert result == cached.get_available_campaigns(req)
+            assert len(result) == offers
+    finally:
+        db.close()
@@ -0,0 +1,39 @@
+# tests/test_load_invariants.py
+from datetime import datetime, timedelta
+
+from benchmarks.load import check_invariants
+from discount_service import models
+
+
+def test_check_invariants_reports_each_cap(database):
+    now = datetime.utcnow()
+    db = database.SessionLocal()
+    camp = models.Campaign(
+        name="Capped",
+        discount_scope=models.DiscountScope.CART,
+        discount_value_type=models.DiscountValueType.FLAT,
+        discount_value=10.0,
+        start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+        total_budget=25.0,
+        max_uses_overall=2,
+        max_transactions_per_customer_per_day=1,
+    )
+    db.add(camp)
+    db.commit()
+    assert check_invariants(db) == []
+
+    for customer_id in ("a", "a", "b"):
+        db.add(
+            models.DiscountRedemption(
+                campaign_id=camp.id, customer_id=customer_id, discount_amount=10.0
+            )
+        )
+    db.commit()
+
+    violations = check_invariants(db)
+    assert len(violations) == 3
+    assert any("total_budget" in v for v in violations)
+    assert any("max_uses_overall" in v for v in violations)
+    assert any("customer a" in v for v in violations)
+    db.close()
@@ -0,0 +1,50 @@
+# tests/test_metrics.py
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+
+def test_metrics_disabled_by_default(make_app):
+    app = make_app()
+    with TestClient(app) as client:
+        assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_report_latency_stages_and_sql(make_app):
+    app = make_app(metrics_enabled=True)
+    now = datetime.utcnow()
+    with TestClient(app) as client:
+        r = client.post(
+            "/campaigns",
+            json={
+                "name": "Metered",
+                "discount_scope": "cart",
+                "discount_value_type": "flat",
+                "discount_value": 5.0,
+                "start_date": (now - timedelta(days=1)).isoformat(),
+                "end_date": (now + timedelta(days=1)).isoformat(),
+                "total_budget": 50.0,
+                "max_transactions_per_customer_per_day": 1,
+            },
+        )
+        assert r.status_code == 200, r.text
+        body = {"customer_id": "m1", "cart_total": 100.0, "delivery_charge": 10.0}
+        assert len(client.post("/discounts/available", json=body).json()) == 1
+        r = client.post("/discounts/apply", json={**body, "campaign_id": r.json()["id"]})
+        assert r.status_code == 200, r.text
+
+        text = client.get("/metrics").text
+
+    assert (
+        'discount_http_request_duration_seconds_count'
+        '{method="POST",route="/discounts/available",status="200"} 1'
+    ) in text
+    assert 'discount_service_stage_duration_seconds_count{operation="available",stage="usage_limits"} 1' in text
+    assert 'discount_service_stage_duration_seconds_count{operation="apply",stage="redeem"} 1' in text
+    assert 'discount_campaigns_returned_per_request_sum{operation="available"} 1' in text
+    statements = [
+        line
+        for line in text.splitlines()
+        if line.startswith('discount_db_statements_per_request_sum{route="/discounts/apply"}')
+    ]
+    assert statements and float(statements[0].split()[-1]) > 0
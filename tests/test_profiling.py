@@ -0,0 +1,53 @@
+# tests/test_profiling.py
+import json
+import pstats
+
+from fastapi.testclient import TestClient
+
+TOKEN = "let-me-profile"
+BODY = {"customer_id": "p1", "cart_total": 100.0, "delivery_charge": 10.0}
+
+
+def test_profiling_disabled_by_default(make_app, tmp_path):
+    app = make_app()
+    with TestClient(app) as client:
+        client.post("/discounts/available", json=BODY, headers={"X-Profile-Token": TOKEN})
+        assert client.get("/debug/profiles").status_code == 404
+    assert not (tmp_path / "profiles").exists()
+
+
+def test_token_triggers_profile_with_sql(make_app, tmp_path):
+    app = make_app(profiling_enabled=True, profiling_token=TOKEN)
+    headers = {"X-Profile-Token": TOKEN}
+    with TestClient(app) as client:
+        client.post("/discounts/available", json=BODY)
+        client.post("/discounts/available", json=BODY, headers={"X-Profile-Token": "nope"})
+        assert client.get("/debug/profiles").status_code == 403
+        assert client.get("/debug/profiles", headers=headers).json() == []
+
+        r = client.post("/discounts/available", json=BODY, headers=headers)
+        assert r.status_code == 200
+        profiles = client.get("/debug/profiles", headers=headers).json()
+
+    assert len(profiles) == 1
+    profile = profiles[0]
+    assert profile["trigger"] == "header"
+    assert profile["route"] == "/discounts/available"
+    assert profile["sql_statements"] > 0
+
+    prof = tmp_path / "profiles" / profile["profile_file"]
+    stats = pstats.Stats(str(prof))
+    assert any(func[2] == "get_available_campaigns" for func in stats.stats)
+    with open(prof.with_suffix(".json")) as fh:
+        assert len(json.load(fh)["sql"]) == profile["sql_statements"]
+
+
+def test_sampled_profiles_kept_only_when_slow(make_app):
+    app = make_app(
+        profiling_enabled=True, profiling_sample_rate=1.0, profiling_slow_ms=1e9
+    )
+    with TestClient(app) as client:
+        client.post("/discounts/available", json=BODY)
+        # Listing always needs a token, sampling-only setups included.
+        assert client.get("/debug/profiles").status_code == 403
+    assert app.state.profile_store.list(10) == []
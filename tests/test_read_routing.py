@@ -0,0 +1,71 @@
+# tests/test_read_routing.py
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from discount_service import models  # noqa: F401
+from discount_service.database import (
+    Base,
+    Database,
+    ReadSessionLocal,
+    RecentWriters,
+    engine,
+    read_engine,
+)
+
+
+def test_read_session_rejects_writes():
+    Base.metadata.create_all(bind=engine)
+    assert read_engine is not engine
+    db = ReadSessionLocal()
+    try:
+        assert db.execute(text("SELECT count(*) FROM campaigns")).scalar() >= 0
+        with pytest.raises(OperationalError):
+            db.execute(text("DELETE FROM campaigns"))
+    finally:
+        db.close()
+
+
+def test_recent_writers_window():
+    writers = RecentWriters(window_seconds=60, max_entries=2)
+    writers.mark("a")
+    assert writers.is_recent("a")
+    assert not writers.is_recent("b")
+
+    writers.mark("b")
+    writers.mark("c")
+    assert not writers.is_recent("a")
+
+    disabled = RecentWriters(window_seconds=0)
+    disabled.mark("a")
+    assert not disabled.is_recent("a")
+
+
+def test_engines_apply_sqlite_pragmas_and_pool_settings(app_settings):
+    cfg = replace(
+        app_settings,
+        sqlite_busy_timeout_ms=1234,
+        db_pool_size=3,
+        db_max_overflow=2,
+        db_pool_timeout_seconds=7,
+    )
+    database = Database(cfg)
+    try:
+        assert database.read_engine is not database.engine
+        expected = {
+            database.engine: {"journal_mode": "wal", "query_only": 0},
+            database.read_engine: {"journal_mode": "wal", "query_only": 1},
+        }
+        for eng, pragmas in expected.items():
+            with eng.connect() as conn:
+                for name, value in pragmas.items():
+                    assert conn.exec_driver_sql(f"PRAGMA {name}").scalar() == value
+                assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+                assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert eng.pool.size() == 3
+            assert eng.pool._max_overflow == 2
+            assert eng.pool.timeout() == 7
+    finally:
+        database.dispose()
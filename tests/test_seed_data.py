@@ -0,0 +1,70 @@
+# tests/test_seed_data.py
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+
+from benchmarks.load import check_invariants
+from discount_service import models
+from discount_service.database import Database, verify_schema
+from seed_data import generate
+
+NOW = datetime(2026, 3, 2, 15, 30)
+
+
+def run_generator(database):
+    return generate(
+        campaigns=12,
+        redemptions=300,
+        customers=40,
+        days=5,
+        seed=11,
+        now=NOW,
+        session_factory=database.SessionLocal,
+    )
+
+
+def dump(db):
+    def rows(model, order):
+        return [
+            tuple(getattr(row, c.name) for c in model.__table__.columns)
+            for row in db.query(model).order_by(order)
+        ]
+
+    return (
+        rows(models.Campaign, models.Campaign.id),
+        rows(models.CampaignTargetCustomer, models.CampaignTargetCustomer.id),
+        rows(models.DiscountRedemption, models.DiscountRedemption.id),
+        # The change feed is stamped with the real write time.
+        [
+            (c.version, c.campaign_id, c.op)
+            for c in db.query(models.CampaignChange).order_by(models.CampaignChange.version)
+        ],
+    )
+
+
+def test_generator_respects_caps_and_is_reproducible(database, app_settings, tmp_path):
+    summary = run_generator(database)
+    assert summary["campaigns"] == 12
+    assert 0 < summary["redemptions"] <= 300
+
+    other = Database(replace(app_settings, database_url=f"sqlite:///{tmp_path / 'again.db'}"))
+    try:
+        verify_schema(other.engine, create_missing=True)
+        run_generator(other)
+
+        first, second = database.SessionLocal(), other.SessionLocal()
+        try:
+            assert check_invariants(first) == []
+            assert dump(first) == dump(second)
+        finally:
+            first.close()
+            second.close()
+    finally:
+        other.dispose()
+
+
+def test_generator_refuses_a_seed_that_is_already_loaded(database):
+    run_generator(database)
+    with pytest.raises(ValueError, match="seed 11 already exists"):
+        run_generator(database)
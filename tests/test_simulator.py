@@ -0,0 +1,63 @@
+# tests/test_simulator.py
+from datetime import datetime, timedelta
+
+from discount_service import schemas
+from discount_service.simulator import (
+    Checkout,
+    Scenario,
+    build_scenarios,
+    run,
+    simulate,
+)
+
+START = datetime(2026, 3, 2, 9, 0)
+
+
+def proposal(name, **overrides):
+    fields = dict(
+        name=name,
+        discount_scope="cart",
+        discount_value_type="flat",
+        discount_value=10.0,
+        start_date=START,
+        end_date=START + timedelta(days=10),
+        total_budget=30.0,
+        max_transactions_per_customer_per_day=1,
+    )
+    fields.update(overrides)
+    return schemas.CampaignCreate(**fields)
+
+
+def checkouts(customers, days=1, per_day=4):
+    return [
+        Checkout(START + timedelta(days=d, hours=h), customers[h % len(customers)], 500.0, 40.0)
+        for d in range(days)
+        for h in range(per_day)
+    ]
+
+
+def test_replay_respects_daily_limit_and_budget():
+    scenario = Scenario("all proposals", [proposal("Ten off").model_dump()], False)
+    # Same customer four times a day: one redemption per day, 3 days of budget.
+    result = simulate(scenario, checkouts(["a"], days=5), existing=[])
+
+    (projection,) = result.campaigns
+    assert projection.redemptions == 3
+    assert projection.spend == 30.0
+    assert projection.exhausted_at == START + timedelta(days=2)
+    assert projection.hours_to_exhaustion == 48.0
+    assert result.discounted_checkouts == 3
+
+
+def test_higher_priority_proposal_takes_redemptions_from_live_campaign():
+    live = proposal("Live", total_budget=1000.0).model_dump()
+    rival = proposal("Rival", priority=10, total_budget=20.0)
+    scenarios = build_scenarios([rival], include_existing=True, each=True)
+    assert [s.name for s in scenarios] == ["baseline", "all proposals"]
+
+    history = checkouts(["a", "b", "c", "d"], days=1)
+    baseline, combined = run(scenarios, history, existing=[live], workers=1)
+
+    assert {p.name: p.redemptions for p in baseline.campaigns} == {"Live": 4}
+    assert {p.name: p.redemptions for p in combined.campaigns} == {"Rival": 2, "Live": 2}
+    assert combined.campaigns[0].proposed
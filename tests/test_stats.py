@@ -0,0 +1,147 @@
+# tests/test_stats.py
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from discount_service import models
+from discount_service.database import SessionLocal
+from discount_service.main import app
+from discount_service.repositories import RollupRepository
+from discount_service.rollups import RollupCompactor
+
+client = TestClient(app)
+
+
+def create_cart_campaign():
+    now = datetime.utcnow()
+    payload = {
+        "name": "Cart flat 25",
+        "description": "25 off on cart",
+        "discount_scope": "cart",
+        "discount_value_type": "flat",
+        "discount_value": 25.0,
+        "start_date": now.isoformat(),
+        "end_date": (now + timedelta(days=1)).isoformat(),
+        "total_budget": 1000.0,
+        "max_transactions_per_customer_per_day": 2,
+    }
+    r = client.post("/campaigns", json=payload)
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def apply(campaign_id, customer_id):
+    r = client.post(
+        "/discounts/apply",
+        json={
+            "campaign_id": campaign_id,
+            "customer_id": customer_id,
+            "cart_total": 300.0,
+            "delivery_charge": 0.0,
+        },
+    )
+    assert r.status_code == 200, r.text
+
+
+def compact(settle_seconds=0.0):
+    # What the scheduled `python -m discount_service.rollups` run does; SQLite
+    # commits ids in order, so the tests can fold without a settle window.
+    db = SessionLocal()
+    try:
+        return RollupCompactor(settle_seconds=settle_seconds).compact(db)
+    finally:
+        db.close()
+
+
+def test_campaign_stats_are_incremental():
+    campaign_id = create_cart_campaign()
+    apply(campaign_id, "statsA")
+    apply(campaign_id, "statsA")
+    compact()
+
+    r = client.get(f"/campaigns/{campaign_id}/stats")
+    assert r.status_code == 200, r.text
+    stats = r.json()
+    assert stats["redemptions"] == 2
+    assert stats["total_discount"] == 50.0
+    assert stats["unique_customers"] == 1
+    assert len(stats["days"]) == 1
+
+    apply(campaign_id, "statsB")
+    r2 = client.get(f"/campaigns/{campaign_id}/stats")
+    # Reads do not fold new redemptions by default.
+    assert r2.json()["redemptions"] == 2
+    compact()
+    r2 = client.get(f"/campaigns/{campaign_id}/stats")
+    stats2 = r2.json()
+    assert stats2["redemptions"] == 3
+    assert stats2["unique_customers"] == 2
+    assert stats2["days"][0]["unique_customers"] == 2
+    assert stats2["as_of_redemption_id"] > stats["as_of_redemption_id"]
+
+
+def test_list_campaign_stats():
+    campaign_id = create_cart_campaign()
+    apply(campaign_id, "statsC")
+    compact()
+
+    r = client.get("/stats/campaigns?page=1&page_size=100")
+    assert r.status_code == 200, r.text
+    page = r.json()
+    match = [s for s in page["items"] if s["campaign_id"] == campaign_id]
+    assert match
+    assert match[0]["redemptions"] == 1
+    assert match[0]["total_discount"] == 25.0
+
+    r2 = client.get("/campaigns/999999/stats")
+    assert r2.status_code == 404
+
+
+def test_rollup_on_read_folds_before_reading(make_app):
+    with TestClient(make_app(rollup_on_read=True, rollup_settle_seconds=0.0)) as on_read:
+        now = datetime.utcnow()
+        r = on_read.post(
+            "/campaigns",
+            json={
+                "name": "On read",
+                "discount_scope": "cart",
+                "discount_value_type": "flat",
+                "discount_value": 10.0,
+                "start_date": now.isoformat(),
+                "end_date": (now + timedelta(days=1)).isoformat(),
+                "total_budget": 100.0,
+                "max_transactions_per_customer_per_day": 1,
+            },
+        )
+        campaign_id = r.json()["id"]
+        r = on_read.post(
+            "/discounts/apply",
+            json={
+                "campaign_id": campaign_id,
+                "customer_id": "statsD",
+                "cart_total": 100.0,
+                "delivery_charge": 0.0,
+            },
+        )
+        assert r.status_code == 200, r.text
+        assert on_read.get(f"/campaigns/{campaign_id}/stats").json()["redemptions"] == 1
+
+
+def test_settle_window_holds_back_fresh_redemptions():
+    campaign_id = create_cart_campaign()
+    compact()
+    apply(campaign_id, "statsE")
+    assert compact(settle_seconds=60.0) == 0
+    assert compact() == 1
+
+
+def test_lock_watermark_creates_the_row_once(database):
+    first, second = database.SessionLocal(), database.SessionLocal()
+    try:
+        assert RollupRepository(first).lock_watermark("w").last_redemption_id == 0
+        first.commit()
+        assert RollupRepository(second).lock_watermark("w").last_redemption_id == 0
+        second.commit()
+        assert second.query(models.RollupWatermark).count() == 1
+    finally:
+        first.close()
+        second.close()